@@ -1,84 +1,95 @@
 import torch
 import torch.nn as nn
-from torch.utils.data import DataLoader
 from transformers import AutoTokenizer, AutoModelForSequenceClassification, AdamW
 from datasets import load_dataset
 from tqdm import tqdm
+from training_data import load_tokenized_dataset, build_dataloader, ThroughputMeter
 
 # Setup
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 model_name = "distilbert-base-uncased"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForSequenceClassification.from_pretrained(model_name, num_labels=2)
-model.to(device)
-
-# Load and prepare data
-dataset = load_dataset("imdb")
-
-def tokenize_function(examples):
-    return tokenizer(examples["text"], padding=True, truncation=True, max_length=256)
-
-tokenized_datasets = dataset.map(tokenize_function, batched=True)
-tokenized_datasets = tokenized_datasets.rename_column("label", "labels")
-tokenized_datasets.set_format("torch", columns=["input_ids", "attention_mask", "labels"])
-
-train_loader = DataLoader(tokenized_datasets["train"], batch_size=16, shuffle=True)
-eval_loader = DataLoader(tokenized_datasets["test"], batch_size=16)
-
-# Optimizer and loss
-optimizer = AdamW(model.parameters(), lr=5e-5)
-loss_fn = nn.CrossEntropyLoss()
+max_length = 256
+batch_size = 16
 
 # Training loop
-def train_epoch(model, dataloader, optimizer, loss_fn, device):
+def train_epoch(model, dataloader, optimizer, loss_fn, device, meter):
     model.train()
-    total_loss = 0
-    
+    total_loss = torch.zeros((), device=device)
+
     for batch in tqdm(dataloader, desc="Training"):
         optimizer.zero_grad()
-        
-        inputs = {k: v.to(device) for k, v in batch.items() if k != 'labels'}
-        labels = batch['labels'].to(device)
-        
+
+        inputs = {k: v.to(device, non_blocking=True) for k, v in batch.items() if k != 'labels'}
+        labels = batch['labels'].to(device, non_blocking=True)
+
         outputs = model(**inputs)
         loss = loss_fn(outputs.logits, labels)
-        
+
         loss.backward()
         optimizer.step()
-        
-        total_loss += loss.item()
-    
-    return total_loss / len(dataloader)
+
+        # Accumulate on device; read back once per epoch instead of every step
+        total_loss += loss.detach()
+        meter.update(inputs['attention_mask'])
+
+    return total_loss.item() / len(dataloader)
 
 # Evaluation function
 def evaluate(model, dataloader, device):
     model.eval()
-    correct = 0
+    correct = torch.zeros((), dtype=torch.long, device=device)
     total = 0
-    
+
     with torch.no_grad():
         for batch in tqdm(dataloader, desc="Evaluating"):
-            inputs = {k: v.to(device) for k, v in batch.items() if k != 'labels'}
-            labels = batch['labels'].to(device)
-            
+            inputs = {k: v.to(device, non_blocking=True) for k, v in batch.items() if k != 'labels'}
+            labels = batch['labels'].to(device, non_blocking=True)
+
             outputs = model(**inputs)
             predictions = torch.argmax(outputs.logits, dim=-1)
-            
-            correct += (predictions == labels).sum().item()
+
+            correct += (predictions == labels).sum()
             total += labels.size(0)
-    
-    return correct / total
-
-# Training
-num_epochs = 3
-for epoch in range(num_epochs):
-    print(f"Epoch {epoch + 1}/{num_epochs}")
-    
-    train_loss = train_epoch(model, train_loader, optimizer, loss_fn, device)
-    accuracy = evaluate(model, eval_loader, device)
-    
-    print(f"Train Loss: {train_loss:.4f}, Accuracy: {accuracy:.4f}")
-
-# Save model
-model.save_pretrained("./custom-fine-tuned")
-tokenizer.save_pretrained("./custom-fine-tuned")
\ No newline at end of file
+
+    return correct.item() / total
+
+def main():
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name, num_labels=2)
+    model.to(device)
+
+    # Load and prepare data (tokenized once, then served from the on-disk cache)
+    tokenized_datasets = load_tokenized_dataset(
+        lambda: load_dataset("imdb"), tokenizer, max_length, dataset_name="imdb"
+    )
+
+    train_loader = build_dataloader(tokenized_datasets["train"], tokenizer, batch_size, shuffle=True)
+    eval_loader = build_dataloader(tokenized_datasets["test"], tokenizer, batch_size, shuffle=False)
+
+    # Optimizer and loss
+    optimizer = AdamW(model.parameters(), lr=5e-5)
+    loss_fn = nn.CrossEntropyLoss()
+    meter = ThroughputMeter(device)
+
+    # Training
+    num_epochs = 3
+    for epoch in range(num_epochs):
+        print(f"Epoch {epoch + 1}/{num_epochs}")
+        train_loader.batch_sampler.set_epoch(epoch)
+        meter.reset()
+
+        train_loss = train_epoch(model, train_loader, optimizer, loss_fn, device, meter)
+        stats = meter.report()
+        accuracy = evaluate(model, eval_loader, device)
+
+        print(f"Train Loss: {train_loss:.4f}, Accuracy: {accuracy:.4f}")
+        print(f"Throughput: {stats['tokens_per_sec']:.0f} tokens/sec, "
+              f"padding ratio: {stats['padding_ratio']:.2%} ({stats['seconds']}s)")
+
+    # Save model
+    model.save_pretrained("./custom-fine-tuned")
+    tokenizer.save_pretrained("./custom-fine-tuned")
+
+if __name__ == "__main__":
+    # Guard required for multi-worker data loading on Windows (spawn start method)
+    main()
@@ -0,0 +1,207 @@
+"""
+Admission Control for UKnow API
+Per-endpoint concurrency limits with a bounded, time-limited wait queue and
+per-user token-bucket rate limits, so expensive NLP requests are shed with
+429/503 instead of starving cheap endpoints
+
+Limits are enforced per server process.
+"""
+
+import math
+import threading
+import time
+import logging
+from collections import OrderedDict, deque
+from functools import wraps
+from flask import request, jsonify, make_response
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class _Waiter:
+    __slots__ = ('condition', 'granted')
+
+    def __init__(self, lock):
+        self.condition = threading.Condition(lock)
+        self.granted = False
+
+class ConcurrencyLimiter:
+    """
+    Caps concurrent requests for an endpoint group
+
+    Up to max_concurrent requests run at once; up to max_queue more wait at
+    most queue_timeout seconds for a slot. Everything beyond that is rejected.
+    Waiters are admitted in arrival order: release() hands its slot straight
+    to the oldest waiter, so a newly woken thread cannot overtake it.
+    """
+
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self.active = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self._avg_service_seconds = 1.0
+
+    def acquire(self):
+        """
+        Wait for a slot
+
+        Returns:
+            str: 'admitted', 'queue_full' or 'timeout'
+        """
+        with self._lock:
+            if self.active < self.max_concurrent and not self._waiters:
+                self.active += 1
+                self.admitted += 1
+                return 'admitted'
+            if len(self._waiters) >= self.max_queue:
+                self.rejected_queue_full += 1
+                return 'queue_full'
+
+            waiter = _Waiter(self._lock)
+            self._waiters.append(waiter)
+            deadline = time.monotonic() + self.queue_timeout
+            while not waiter.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiters.remove(waiter)
+                    self.rejected_timeout += 1
+                    return 'timeout'
+                waiter.condition.wait(remaining)
+            # The releasing request handed over its slot, so active is unchanged
+            self.admitted += 1
+            return 'admitted'
+
+    def release(self, service_seconds=None):
+        with self._lock:
+            if service_seconds is not None:
+                # Exponentially weighted average, used for Retry-After estimates
+                self._avg_service_seconds = 0.8 * self._avg_service_seconds + 0.2 * service_seconds
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                waiter.condition.notify()
+            else:
+                self.active -= 1
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    def retry_after(self):
+        """Seconds until a slot is likely free: queued work divided across slots"""
+        backlog = (self.waiting + 1) / max(self.max_concurrent, 1)
+        return max(1, math.ceil(backlog * self._avg_service_seconds))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'active': self.active,
+                'queue_depth': len(self._waiters),
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'queue_timeout': self.queue_timeout,
+                'admitted': self.admitted,
+                'rejected_queue_full': self.rejected_queue_full,
+                'rejected_timeout': self.rejected_timeout,
+                'avg_service_seconds': round(self._avg_service_seconds, 3)
+            }
+
+class RateLimiter:
+    """
+    Per-key token buckets (refill rate in tokens/second, burst capacity)
+
+    Only the max_keys most recently seen keys are tracked.
+    """
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.limited = 0
+
+    def check(self, key):
+        """
+        Take one token for a key
+
+        Returns:
+            tuple: (allowed, retry_after_seconds)
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            else:
+                self.limited += 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        retry_after = 0 if allowed else max(1, math.ceil((1 - tokens) / self.rate))
+        return allowed, retry_after
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rate_per_second': self.rate,
+                'burst': self.burst,
+                'tracked_users': len(self._buckets),
+                'rate_limited': self.limited
+            }
+
+def request_user_key():
+    """Identify the caller for rate limiting: explicit user_id, else client address"""
+    user_id = request.args.get('user_id') or request.form.get('user_id')
+    if not user_id and request.is_json:
+        user_id = (request.get_json(silent=True) or {}).get('user_id')
+    return str(user_id or request.remote_addr or 'anonymous')
+
+def _rejection(message, status, retry_after):
+    response = make_response(jsonify({'error': message, 'retry_after': retry_after}), status)
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def admission_controlled(limiter, rate_limiter=None):
+    """
+    Decorator that applies a rate limit and a concurrency limit to a view
+
+    Streamed responses keep their slot until the stream is closed.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if rate_limiter is not None:
+                allowed, retry_after = rate_limiter.check(request_user_key())
+                if not allowed:
+                    return _rejection('Rate limit exceeded, please slow down', 429, retry_after)
+
+            outcome = limiter.acquire()
+            if outcome != 'admitted':
+                logger.warning(f"Shedding {request.path}: {limiter.name} {outcome}")
+                return _rejection('Server is busy, please retry shortly', 503, limiter.retry_after())
+
+            started = time.perf_counter()
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                limiter.release()
+                raise
+
+            if response.is_streamed:
+                response.call_on_close(lambda: limiter.release(time.perf_counter() - started))
+            else:
+                limiter.release(time.perf_counter() - started)
+            return response
+        return wrapper
+    return decorator
@@ -1,36 +1,122 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Request, request, jsonify, Response, stream_with_context, current_app
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
-from sqlalchemy import inspect
+from sqlalchemy import inspect, event, insert, delete, select
+from sqlalchemy.schema import CreateTable, CreateIndex
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+import sqlite3
+import click
 import PyPDF2
 import re
-from collections import Counter
+from collections import Counter, OrderedDict
 import random
 import logging
+import threading
+import math
+import heapq
+import json
+import time
 from deep_learning_service import dl_service
+from scheduler import sr_scheduler
+from search_index import create_search_index, rebuild_search_index, search_flashcards
+from related_index import RelatedCardsIndex, create_change_log
+from sharding import ShardRouter
+from text_analysis import AnalyzedDocument, analyze_document
+from term_dedup import collapse_near_duplicates, normalize_term
+from response_encoding import init_response_encoding
+from admission_control import ConcurrencyLimiter, RateLimiter, admission_controlled
+from data_transfer import gzip_ndjson_stream, read_ndjson, EXPORT_FORMAT, EXPORT_VERSION
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class UKnowRequest(Request):
+    """Request class that allows much larger bodies for data imports"""
+    @property
+    def max_content_length(self):
+        if self.path == '/api/import':
+            return current_app.config['IMPORT_MAX_CONTENT_LENGTH']
+        return super().max_content_length
+
 # Initialize Flask app
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///uknow.db'
+app.request_class = UKnowRequest
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('UKNOW_DATABASE_URI', 'sqlite:///uknow.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'uploads'
+app.config['RELATED_INDEX_FOLDER'] = 'related_index'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['IMPORT_MAX_CONTENT_LENGTH'] = 8 * 1024 * 1024 * 1024  # 8GB max import body
+app.config['PERFORMANCE_SHARDS'] = int(os.environ.get('UKNOW_PERFORMANCE_SHARDS', 1))  # SQLite files for per-user study data
 
 # Initialize extensions
 db = SQLAlchemy(app)
+init_response_encoding(app)  # orjson (if installed) and gzip/brotli for large responses
 CORS(app, origins=['http://localhost:3000', 'http://127.0.0.1:3000'], 
      methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
      allow_headers=['Content-Type', 'Authorization'])
 
+@event.listens_for(Engine, 'connect')
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    """
+    WAL lets long-running reads (e.g. exports) proceed alongside writes;
+    foreign keys are off by default in SQLite and ON DELETE CASCADE needs them
+    """
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+# Admission control for expensive endpoints (per process): concurrent slots,
+# bounded wait queue and per-user token buckets
+generation_limiter = ConcurrencyLimiter('generation', max_concurrent=2, max_queue=8, queue_timeout=15)
+summarize_limiter = ConcurrencyLimiter('summarize', max_concurrent=2, max_queue=8, queue_timeout=10)
+translate_limiter = ConcurrencyLimiter('translate', max_concurrent=4, max_queue=16, queue_timeout=10)
+heavy_rate_limiter = RateLimiter(rate=0.2, burst=5)  # 12 requests/minute sustained per user
+ADMISSION_LIMITERS = [generation_limiter, summarize_limiter, translate_limiter]
+
+# Export/import chunk size (rows per yield_per batch and per bulk insert)
+TRANSFER_CHUNK_SIZE = 1000
+
+# Most recently used external user id -> integer key mappings kept in memory
+USER_KEY_CACHE_SIZE = 10000
+
+# Flashcard generation limits
+DEFAULT_CARDS_PER_SET = 20
+MAX_CARDS_PER_SET = 100
+
+# Related cards returned per request
+DEFAULT_RELATED_CARDS = 10
+MAX_RELATED_CARDS = 50
+
+# Streaming generation: characters per processing chunk and cards per commit
+STREAM_CHUNK_CHARS = 2000
+STREAM_COMMIT_BATCH = 5
+
+# Ranking weight per candidate kind (spaCy entity label or extraction method)
+TERM_KIND_WEIGHTS = {
+    'LAW': 1.5,
+    'EVENT': 1.4,
+    'WORK_OF_ART': 1.3,
+    'ORG': 1.2,
+    'PERSON': 1.2,
+    'GPE': 1.0,
+    'LANGUAGE': 1.0,
+    'NOUN_CHUNK': 1.0,
+    'PROPER_NOUN': 0.9
+}
+
 # Create upload directory
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# TF-IDF related cards index (memory-mapped from disk, synced with the flashcard table on use)
+related_index = RelatedCardsIndex(app.config['RELATED_INDEX_FOLDER'])
+
 # Load spaCy model (optional - will use fallback if not available)
 try:
     import spacy
@@ -45,7 +131,9 @@ class FlashcardSet(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    flashcards = db.relationship('Flashcard', backref='flashcard_set', lazy=True, cascade='all, delete-orphan')
+    import_id = db.Column(db.Integer, db.ForeignKey('data_import.id', ondelete='SET NULL'), index=True)  # Set by import_records
+    # Children are removed by ON DELETE CASCADE in SQL; passive_deletes stops the ORM loading them
+    flashcards = db.relationship('Flashcard', backref='flashcard_set', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
 
 class Flashcard(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -54,16 +142,77 @@ class Flashcard(db.Model):
     answer = db.Column(db.Text, nullable=False)
     context = db.Column(db.Text)
     difficulty_level = db.Column(db.String(20), default='medium')  # easy, medium, hard
-    set_id = db.Column(db.Integer, db.ForeignKey('flashcard_set.id'), nullable=False)
-    performance_records = db.relationship('PerformanceRecord', backref='flashcard', lazy=True)
+    set_id = db.Column(db.Integer, db.ForeignKey('flashcard_set.id', ondelete='CASCADE'), nullable=False, index=True)
+    performance_records = db.relationship('PerformanceRecord', backref='flashcard', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+
+    __table_args__ = {'sqlite_autoincrement': True}  # Ids are never reused, which the related cards index relies on
+
+class User(db.Model):
+    """Maps external user identifiers (session ids) to compact integer keys"""
+    id = db.Column(db.Integer, primary_key=True)
+    external_id = db.Column(db.String(100), nullable=False, unique=True)  # Session ID or user identifier
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class PerformanceRecord(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    flashcard_id = db.Column(db.Integer, db.ForeignKey('flashcard.id'), nullable=False)
-    user_id = db.Column(db.String(100), nullable=False)  # Session ID or user identifier
+    flashcard_id = db.Column(db.Integer, db.ForeignKey('flashcard.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
     status = db.Column(db.String(20), nullable=False)  # 'correct' or 'incorrect'
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+class DailyPerformance(db.Model):
+    """Per-day answer counts for a user and set, maintained on every recorded answer"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(100), nullable=False)
+    set_id = db.Column(db.Integer, db.ForeignKey('flashcard_set.id', ondelete='CASCADE'), nullable=False, index=True)
+    day = db.Column(db.Date, nullable=False)
+    correct_count = db.Column(db.Integer, nullable=False, default=0)
+    incorrect_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'set_id', 'day', name='uq_daily_performance_user_set_day'),
+        db.Index('ix_daily_performance_user_day', 'user_id', 'day'),
+    )
+
+class ImportedDocument(db.Model):
+    """Source files already processed by the bulk importer, keyed by content hash"""
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False, unique=True)
+    filename = db.Column(db.String(500), nullable=False)
+    status = db.Column(db.String(20), nullable=False)  # 'imported', 'empty' or 'failed'
+    set_id = db.Column(db.Integer, db.ForeignKey('flashcard_set.id', ondelete='SET NULL'), index=True)
+    card_count = db.Column(db.Integer, default=0)
+    imported_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class DataImport(db.Model):
+    """One run of import_records; its sets carry the run id so a failed or interrupted run can be rolled back"""
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='running')  # 'running', 'completed' or 'rolled_back'
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+class CardSchedule(db.Model):
+    """SM-2 review state per (user, flashcard), indexed by due time"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(100), nullable=False)
+    flashcard_id = db.Column(db.Integer, db.ForeignKey('flashcard.id', ondelete='CASCADE'), nullable=False, index=True)
+    set_id = db.Column(db.Integer, db.ForeignKey('flashcard_set.id', ondelete='CASCADE'), nullable=False, index=True)  # Denormalized for the due index
+    repetitions = db.Column(db.Integer, nullable=False, default=0)
+    interval_days = db.Column(db.Float, nullable=False, default=0)
+    ease_factor = db.Column(db.Float, nullable=False, default=sr_scheduler.DEFAULT_EASE_FACTOR)
+    due_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_reviewed_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'flashcard_id', name='uq_card_schedule_user_flashcard'),
+        db.Index('ix_card_schedule_user_set_due', 'user_id', 'set_id', 'due_at'),
+    )
+
+# Per-user study data is routed to a shard file by hashed user id; sets,
+# flashcards and users stay in the primary database
+performance_router = ShardRouter(db, [PerformanceRecord, DailyPerformance, CardSchedule])
+performance_router.init_app(app)
+
 # NLP Core Functions
 def extract_text_from_pdf(file_path):
     """Extract text from PDF file using PyPDF2"""
@@ -78,14 +227,36 @@ def extract_text_from_pdf(file_path):
         print(f"Error extracting PDF text: {e}")
         return ""
 
+def _add_term_candidate(candidates, term, context, offset, kind):
+    """Record one occurrence of a candidate term; the first context is kept"""
+    candidate = candidates.get(term)
+    if candidate is None:
+        candidates[term] = {
+            'context': context,
+            'count': 1,
+            'first_offset': offset,
+            'last_offset': offset,
+            'kind': kind
+        }
+    else:
+        candidate['count'] += 1
+        candidate['last_offset'] = offset
+
 def extract_key_terms(text):
-    """Extract key terms and their contexts using spaCy NER and noun phrases"""
+    """
+    Extract candidate key terms with their context and occurrence statistics
+    using spaCy NER and noun phrases
+
+    Returns:
+        dict: term -> {'context', 'count', 'first_offset', 'last_offset', 'kind'}
+    """
+    document = analyze_document(text)
     if not nlp:
         # Fallback method without spaCy
-        return extract_key_terms_fallback(text)
+        return extract_key_terms_fallback(document)
     
-    doc = nlp(text)
-    terms_with_context = {}
+    doc = document.parse(nlp)
+    candidates = {}
     
     # Extract named entities
     for ent in doc.ents:
@@ -93,7 +264,7 @@ def extract_key_terms(text):
             # Get sentence context
             sentence = ent.sent.text.strip()
             if len(ent.text) > 2 and len(sentence) > 10:
-                terms_with_context[ent.text] = sentence
+                _add_term_candidate(candidates, ent.text, sentence, ent.start_char, ent.label_)
     
     # Extract important noun phrases
     for chunk in doc.noun_chunks:
@@ -102,18 +273,17 @@ def extract_key_terms(text):
             if not any(word in chunk.text.lower() for word in ['this', 'that', 'these', 'those', 'some', 'many', 'few']):
                 sentence = chunk.sent.text.strip()
                 if len(sentence) > 10:
-                    terms_with_context[chunk.text] = sentence
+                    _add_term_candidate(candidates, chunk.text, sentence, chunk.start_char, 'NOUN_CHUNK')
     
-    return terms_with_context
+    return candidates
 
 def extract_key_terms_fallback(text):
     """Fallback method for key term extraction without spaCy"""
-    sentences = text.split('.')
-    terms_with_context = {}
+    document = analyze_document(text)
+    candidates = {}
     
     # Simple pattern matching for capitalized terms and phrases
-    for sentence in sentences:
-        sentence = sentence.strip()
+    for sentence, (offset, _) in zip(document.sentences, document.sentence_spans):
         if len(sentence) < 10:
             continue
             
@@ -129,9 +299,32 @@ def extract_key_terms_fallback(text):
                     j += 1
                 
                 if len(term) > 2 and not term.lower() in ['the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for']:
-                    terms_with_context[term] = sentence
+                    _add_term_candidate(candidates, term, sentence, offset, 'PROPER_NOUN')
+    
+    return candidates
+
+def rank_key_terms(candidates, limit, text_length):
+    """
+    Select the top-k candidates by frequency, spread across the document and kind
+
+    Uses a min-heap bounded at `limit`, so ranking costs O(n log k) and only
+    the selected terms go on to question, answer and difficulty generation.
+
+    Returns:
+        list: (term, context, score) tuples, best first
+    """
+    heap = []
+    for term, candidate in candidates.items():
+        spread = (candidate['last_offset'] - candidate['first_offset']) / max(text_length, 1)
+        score = (1 + math.log(candidate['count'])) * (1 + spread) * TERM_KIND_WEIGHTS.get(candidate['kind'], 1.0)
+        # Ties go to the term that appears earlier in the document
+        item = (score, -candidate['first_offset'], term)
+        if len(heap) < limit:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
     
-    return terms_with_context
+    return [(term, candidates[term]['context'], round(score, 4)) for score, _, term in sorted(heap, reverse=True)]
 
 def generate_question(term, context):
     """Generate a question for the flashcard based on term and context"""
@@ -160,54 +353,555 @@ def generate_question(term, context):
 def generate_answer_from_context(term, context):
     """Extract or generate an answer from the context"""
     # Simple approach: use the sentence containing the term as the answer
-    sentences = context.split('.')
-    
-    for sentence in sentences:
-        if term.lower() in sentence.lower() and len(sentence.strip()) > 10:
-            return sentence.strip()
+    for sentence in analyze_document(context).sentences_containing(term):
+        if len(sentence) > 10:
+            return sentence
     
     # Fallback: return the context itself if term not found in individual sentences
     return context.strip()
 
+# User Key Functions
+_user_key_cache = OrderedDict()
+_user_key_cache_lock = threading.Lock()
+
+def resolve_user_key(external_id, create=True):
+    """
+    Map an external user identifier to its integer key in the user table
+
+    Hits are served from an in-process LRU. Misses read the user table and,
+    with create, insert the row in its own short transaction, so a cached key
+    never points at a row that was rolled back. Call this before the
+    request's session starts writing, since SQLite allows a single writer.
+
+    Returns:
+        int or None: The key, or None for an unknown user when create is False
+    """
+    with _user_key_cache_lock:
+        key = _user_key_cache.get(external_id)
+        if key is not None:
+            _user_key_cache.move_to_end(external_id)
+            return key
+
+    with db.engine.begin() as conn:
+        key = conn.scalar(select(User.id).where(User.external_id == external_id))
+        if key is None:
+            if not create:
+                return None
+            conn.execute(sqlite_insert(User).values(external_id=external_id, created_at=datetime.utcnow())
+                         .on_conflict_do_nothing(index_elements=['external_id']))
+            key = conn.scalar(select(User.id).where(User.external_id == external_id))
+
+    with _user_key_cache_lock:
+        _user_key_cache[external_id] = key
+        if len(_user_key_cache) > USER_KEY_CACHE_SIZE:
+            _user_key_cache.popitem(last=False)
+    return key
+
+def user_keys_in_session(external_ids):
+    """
+    Resolve many external user identifiers inside the current session,
+    creating missing users (bulk paths that already hold the write lock)
+
+    Results are not cached, since the surrounding transaction may roll back.
+
+    Returns:
+        dict: external_id -> integer key
+    """
+    external_ids = set(external_ids)
+    if not external_ids:
+        return {}
+    now = datetime.utcnow()
+    db.session.execute(sqlite_insert(User).on_conflict_do_nothing(index_elements=['external_id']),
+                       [{'external_id': external_id, 'created_at': now} for external_id in external_ids])
+    rows = db.session.execute(select(User.external_id, User.id).where(User.external_id.in_(external_ids)))
+    return dict(rows.all())
+
+# Spaced Repetition Functions
+def update_card_schedule(session, flashcard, user_id, status, quality=None):
+    """Apply one answer to the user's SM-2 state for a flashcard (caller commits)"""
+    schedule = session.query(CardSchedule).filter_by(user_id=user_id, flashcard_id=flashcard.id).first()
+    if not schedule:
+        schedule = CardSchedule(
+            user_id=user_id,
+            flashcard_id=flashcard.id,
+            set_id=flashcard.set_id,
+            repetitions=0,
+            interval_days=0,
+            ease_factor=sr_scheduler.DEFAULT_EASE_FACTOR
+        )
+        session.add(schedule)
+
+    now = datetime.utcnow()
+    state = sr_scheduler.review(
+        schedule.repetitions,
+        schedule.interval_days,
+        schedule.ease_factor,
+        sr_scheduler.quality_from_status(status, quality),
+        reviewed_at=now
+    )
+    schedule.repetitions = state['repetitions']
+    schedule.interval_days = state['interval_days']
+    schedule.ease_factor = state['ease_factor']
+    schedule.due_at = state['due_at']
+    schedule.last_reviewed_at = now
+    return schedule
+
+# Learning Timeline Functions
+def increment_daily_performance(session, user_id, set_id, status, day=None):
+    """Add one answer to the user's daily rollup with a single upsert (caller commits)"""
+    correct = 1 if status == 'correct' else 0
+    statement = sqlite_insert(DailyPerformance).values(
+        user_id=user_id,
+        set_id=set_id,
+        day=day or datetime.utcnow().date(),
+        correct_count=correct,
+        incorrect_count=1 - correct
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=['user_id', 'set_id', 'day'],
+        set_={
+            'correct_count': DailyPerformance.correct_count + statement.excluded.correct_count,
+            'incorrect_count': DailyPerformance.incorrect_count + statement.excluded.incorrect_count
+        }
+    )
+    session.execute(statement)
+
+BACKFILL_DAILY_PERFORMANCE_SQL = """
+    INSERT INTO daily_performance (user_id, set_id, day, correct_count, incorrect_count)
+    SELECT u.external_id, f.set_id, date(r.timestamp),
+           SUM(CASE WHEN r.status = 'correct' THEN 1 ELSE 0 END),
+           SUM(CASE WHEN r.status = 'correct' THEN 0 ELSE 1 END)
+    FROM performance_record r
+    JOIN flashcard f ON f.id = r.flashcard_id
+    JOIN user u ON u.id = r.user_id
+    {where}
+    GROUP BY u.external_id, f.set_id, date(r.timestamp)
+"""
+
+def backfill_daily_performance(session, set_ids=None, chunk_size=500):
+    """
+    Rebuild daily rollups from raw performance records in SQL (caller commits)
+
+    Works on one session's database, i.e. one shard when sharded. With
+    set_ids, only those sets are rebuilt; otherwise every rollup is.
+    """
+    if set_ids is None:
+        session.execute(db.text("DELETE FROM daily_performance"))
+        session.execute(db.text(BACKFILL_DAILY_PERFORMANCE_SQL.format(where='')))
+        return
+    set_ids = list(set_ids)
+    for start in range(0, len(set_ids), chunk_size):
+        chunk = set_ids[start:start + chunk_size]
+        params = {f's{i}': set_id for i, set_id in enumerate(chunk)}
+        placeholders = ', '.join(f':{name}' for name in params)
+        session.execute(db.text(f"DELETE FROM daily_performance WHERE set_id IN ({placeholders})"), params)
+        session.execute(db.text(BACKFILL_DAILY_PERFORMANCE_SQL.format(
+            where=f"WHERE f.set_id IN ({placeholders})")), params)
+
+# Related Cards Functions
+def find_related_flashcards(card_ids, k, exclude=()):
+    """
+    Top-k cards across all sets most similar to the given cards
+
+    Returns:
+        list: Card summaries with their cosine similarity, best first
+    """
+    related_index.catch_up(db.engine)
+    neighbours = related_index.related(card_ids, k, exclude=exclude)
+    if not neighbours:
+        return []
+    
+    rows = db.session.query(Flashcard.id, Flashcard.term, Flashcard.question, Flashcard.set_id,
+                            FlashcardSet.title).join(FlashcardSet, Flashcard.set_id == FlashcardSet.id).filter(
+        Flashcard.id.in_([card_id for card_id, _ in neighbours])).all()
+    cards = {row.id: row for row in rows}
+    return [{
+        'id': card_id,
+        'term': cards[card_id].term,
+        'question': cards[card_id].question,
+        'set_id': cards[card_id].set_id,
+        'set_title': cards[card_id].title,
+        'similarity': round(score, 4)
+    } for card_id, score in neighbours if card_id in cards]
+
+# Flashcard Generation Helpers
+def read_generation_request():
+    """
+    Read the text, title and card limit of an upload/generate request
+
+    Returns:
+        tuple: (text, title, limit, error) where error is a message or None
+    """
+    # Check if file is provided
+    if 'file' not in request.files and 'text' not in request.form:
+        return None, None, None, 'No file or text provided'
+    
+    text = ""
+    title = "Untitled Flashcard Set"
+    
+    # Handle file upload
+    if 'file' in request.files and request.files['file'].filename:
+        file = request.files['file']
+        if file.filename.endswith('.pdf'):
+            filename = file.filename
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            file.save(filepath)
+            text = extract_text_from_pdf(filepath)
+            title = filename.replace('.pdf', '')
+            # Clean up uploaded file
+            os.remove(filepath)
+        else:
+            return None, None, None, 'Only PDF files are supported'
+    
+    # Handle raw text input
+    elif 'text' in request.form:
+        text = request.form['text']
+        title = request.form.get('title', 'Text-based Flashcard Set')
+    
+    limit = request.form.get('limit', DEFAULT_CARDS_PER_SET, type=int)
+    limit = max(1, min(limit, MAX_CARDS_PER_SET))
+    
+    if not text or len(text.strip()) < 50:
+        return None, None, None, 'Insufficient text content for flashcard generation'
+    
+    return text, title, limit, None
+
+def generate_flashcard_fields(ranked_terms):
+    """
+    Generate question, answer and difficulty for ranked (term, context, score)
+    tuples as plain column values (plus 'score')
+
+    Difficulty for every term is analyzed in one call, so a configured
+    difficulty model classifies them in shared batches instead of one
+    micro-batch per card.
+    """
+    questions = [generate_question(term, context) for term, context, _ in ranked_terms]
+    answers = [generate_answer_from_context(term, context) for term, context, _ in ranked_terms]
+    
+    # Analyze difficulty level
+    try:
+        difficulties = [complexity.get('difficulty_level', 'medium') for complexity in
+                        dl_service.analyze_texts_complexity([f"{term} {context}" for term, context, _ in ranked_terms])]
+    except:
+        difficulties = ['medium'] * len(ranked_terms)  # Default fallback
+    
+    return [{
+        'term': term,
+        'question': question,
+        'answer': answer,
+        'context': context,
+        'difficulty_level': difficulty,
+        'score': score
+    } for (term, context, score), question, answer, difficulty in zip(ranked_terms, questions, answers, difficulties)]
+
+def dedupe_candidates(candidates, limit, text_length):
+    """
+    Collapse near-duplicate candidates before any card is generated
+
+    Also ranks the raw candidates to count how many of the cards they would
+    have produced were duplicates of another selected term. That extra
+    ranking pass is part of the stage, so dedup_overhead_ms covers both.
+
+    Returns:
+        tuple: (merged candidates, stats dict)
+    """
+    started = time.perf_counter()
+    merged, aliases = collapse_near_duplicates(candidates)
+    raw_top = rank_key_terms(candidates, limit, text_length)
+    duplicates = len(raw_top) - len({aliases[term] for term, _, _ in raw_top})
+    dedup_ms = (time.perf_counter() - started) * 1000
+    return merged, {
+        'candidate_count': len(candidates),
+        'collapsed_count': len(candidates) - len(merged),
+        'duplicate_cards_avoided': duplicates,
+        'dedup_overhead_ms': round(dedup_ms, 2)
+    }
+
+def generate_flashcards_for_text(text, limit=DEFAULT_CARDS_PER_SET):
+    """
+    Run the full generation pipeline on a text without touching the database
+
+    Returns:
+        tuple: (list of flashcard field dicts with 'score', generation stats dict)
+    """
+    document = AnalyzedDocument(text)
+    candidates, stats = dedupe_candidates(extract_key_terms(document), limit, len(document.text))
+    
+    started = time.perf_counter()
+    cards = generate_flashcard_fields(rank_key_terms(candidates, limit, len(document.text)))
+    
+    # Time the duplicate cards would have taken at this text's per-card cost
+    card_ms = (time.perf_counter() - started) * 1000 / max(len(cards), 1)
+    stats['estimated_generation_ms_saved'] = round(stats['duplicate_cards_avoided'] * card_ms, 1)
+    if stats['collapsed_count']:
+        logger.info(f"Collapsed {stats['collapsed_count']} of {stats['candidate_count']} candidates in "
+                    f"{stats['dedup_overhead_ms']} ms, avoiding {stats['duplicate_cards_avoided']} duplicate cards "
+                    f"(~{stats['estimated_generation_ms_saved']} ms of generation)")
+    return cards, stats
+
+def iter_document_chunks(document, chunk_chars=STREAM_CHUNK_CHARS):
+    """
+    Yield (end offset, chunk) for consecutive runs of whole sentences of
+    roughly chunk_chars characters
+
+    Sentences are found as the chunks are consumed, so the first chunk is
+    ready without scanning the rest of the document.
+    """
+    chunk_start = None
+    for start, end in document.iter_sentence_spans():
+        if chunk_start is None:
+            chunk_start = start
+        if end - chunk_start >= chunk_chars:
+            yield end + 1, AnalyzedDocument(document.text[chunk_start:end + 1])
+            chunk_start = None
+    if chunk_start is not None:
+        yield len(document.text), AnalyzedDocument(document.text[chunk_start:])
+
+# Export / Import Functions
+def iter_export_records(set_ids=None):
+    """
+    Yield sets, then cards, then performance records as plain dicts
+
+    Review schedules come last. Each table is read with yield_per so only
+    one chunk of rows is held in memory at a time. Parents always precede
+    children, which lets the importer remap ids in a single pass.
+    """
+    yield {'type': 'header', 'format': EXPORT_FORMAT, 'version': EXPORT_VERSION,
+           'exported_at': datetime.utcnow().isoformat()}
+    
+    sets = db.session.query(FlashcardSet.id, FlashcardSet.title, FlashcardSet.created_at)
+    if set_ids:
+        sets = sets.filter(FlashcardSet.id.in_(set_ids))
+    for row in sets.order_by(FlashcardSet.id).yield_per(TRANSFER_CHUNK_SIZE):
+        yield {'type': 'set', 'id': row.id, 'title': row.title,
+               'created_at': row.created_at.isoformat() if row.created_at else None}
+    
+    cards = db.session.query(Flashcard.id, Flashcard.set_id, Flashcard.term, Flashcard.question,
+                             Flashcard.answer, Flashcard.context, Flashcard.difficulty_level)
+    if set_ids:
+        cards = cards.filter(Flashcard.set_id.in_(set_ids))
+    for row in cards.order_by(Flashcard.id).yield_per(TRANSFER_CHUNK_SIZE):
+        yield {'type': 'card', 'id': row.id, 'set_id': row.set_id, 'term': row.term,
+               'question': row.question, 'answer': row.answer, 'context': row.context,
+               'difficulty_level': row.difficulty_level}
+    
+    # Exports carry the external user id; integer keys are local to a database.
+    # Record ids are per shard, so they are only unique within one shard's run
+    for session in performance_router.sessions():
+        records = session.query(PerformanceRecord.id, PerformanceRecord.flashcard_id, User.external_id.label('user_id'),
+                                PerformanceRecord.status, PerformanceRecord.timestamp).join(
+            User, PerformanceRecord.user_id == User.id)
+        if set_ids:
+            records = records.join(Flashcard, PerformanceRecord.flashcard_id == Flashcard.id).filter(
+                Flashcard.set_id.in_(set_ids))
+        for row in records.order_by(PerformanceRecord.id).yield_per(TRANSFER_CHUNK_SIZE):
+            yield {'type': 'performance', 'id': row.id, 'flashcard_id': row.flashcard_id, 'user_id': row.user_id,
+                   'status': row.status, 'timestamp': row.timestamp.isoformat() if row.timestamp else None}
+    
+    # SM-2 review state, so a restored backup keeps every user's review queue
+    for session in performance_router.sessions():
+        schedules = session.query(CardSchedule.user_id, CardSchedule.flashcard_id, CardSchedule.set_id,
+                                  CardSchedule.repetitions, CardSchedule.interval_days, CardSchedule.ease_factor,
+                                  CardSchedule.due_at, CardSchedule.last_reviewed_at)
+        if set_ids:
+            schedules = schedules.filter(CardSchedule.set_id.in_(set_ids))
+        for row in schedules.order_by(CardSchedule.id).yield_per(TRANSFER_CHUNK_SIZE):
+            yield {'type': 'schedule', 'user_id': row.user_id, 'flashcard_id': row.flashcard_id, 'set_id': row.set_id,
+                   'repetitions': row.repetitions, 'interval_days': row.interval_days, 'ease_factor': row.ease_factor,
+                   'due_at': row.due_at.isoformat(),
+                   'last_reviewed_at': row.last_reviewed_at.isoformat() if row.last_reviewed_at else None}
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value) if value else None
+
+IMPORT_REQUIRED_FIELDS = {
+    'set': ('id', 'title'),
+    'card': ('id', 'set_id', 'term', 'question', 'answer'),
+    'performance': ('flashcard_id', 'user_id', 'status'),
+    'schedule': ('flashcard_id', 'set_id', 'user_id', 'repetitions', 'interval_days', 'ease_factor', 'due_at'),
+}
+IMPORT_DATETIME_FIELDS = {'set': ('created_at',), 'performance': ('timestamp',), 'schedule': ('due_at', 'last_reviewed_at')}
+
+def validate_import_record(line_number, record):
+    """
+    Check an import record's shape before anything is built from it
+
+    Returns the record with its timestamps parsed; raises ValueError naming
+    the line so the import endpoint can answer 400 instead of failing later.
+    """
+    if not isinstance(record, dict):
+        raise ValueError(f"Line {line_number}: expected a JSON object")
+    record_type = record.get('type')
+    if not isinstance(record_type, str):
+        raise ValueError(f"Line {line_number}: missing record type")
+    if record_type not in IMPORT_REQUIRED_FIELDS:
+        return record
+    missing = [field for field in IMPORT_REQUIRED_FIELDS[record_type] if record.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"Line {line_number}: {record_type} record is missing {', '.join(missing)}")
+    if record_type == 'performance' and record['status'] not in ('correct', 'incorrect'):
+        raise ValueError(f"Line {line_number}: invalid status {record['status']!r}")
+    for field in IMPORT_DATETIME_FIELDS.get(record_type, ()):
+        try:
+            record[field] = _parse_datetime(record.get(field))
+        except (TypeError, ValueError):
+            raise ValueError(f"Line {line_number}: invalid {field} {record.get(field)!r}")
+    return record
+
+def import_records(records, chunk_size=TRANSFER_CHUNK_SIZE):
+    """
+    Bulk-insert exported records in chunks, assigning new ids
+
+    Sets and cards are flushed per chunk to learn their new ids; performance
+    records and review schedules are inserted with executemany, on each
+    user's shard. Every chunk
+    commits on its own, so the write lock is only held for one chunk at a
+    time, and the session is cleared after it so memory only grows with the
+    old->new id maps. Imported sets are tagged with a DataImport run: if the
+    import fails its sets are deleted again (see rollback_import), and a run
+    left 'running' by a killed process can be rolled back from the CLI.
+    
+    Args:
+        records: (line_number, record) pairs, as yielded by read_ndjson
+    
+    Returns:
+        dict: Inserted and skipped counts per record type
+    """
+    run = DataImport(status='running')
+    db.session.add(run)
+    db.session.commit()
+    import_id = run.id
+    
+    set_ids = {}
+    card_ids = {}
+    counts = {'import_id': import_id, 'sets': 0, 'cards': 0, 'performance_records': 0, 'schedules': 0, 'skipped': 0}
+    pending = []
+    pending_type = None
+    
+    def flush():
+        if not pending:
+            return
+        if pending_type == 'set':
+            objects = [FlashcardSet(title=r['title'], created_at=r['created_at'] or datetime.utcnow(), import_id=import_id)
+                       for r in pending]
+            db.session.add_all(objects)
+            db.session.flush()
+            for record, obj in zip(pending, objects):
+                set_ids[record['id']] = obj.id
+            counts['sets'] += len(objects)
+        elif pending_type == 'card':
+            objects = [Flashcard(set_id=set_ids[r['set_id']], term=r['term'], question=r['question'],
+                                 answer=r['answer'], context=r.get('context'),
+                                 difficulty_level=r.get('difficulty_level') or 'medium')
+                       for r in pending]
+            db.session.add_all(objects)
+            db.session.flush()
+            for record, obj in zip(pending, objects):
+                card_ids[record['id']] = obj.id
+            counts['cards'] += len(objects)
+        elif pending_type == 'performance':
+            user_keys = user_keys_in_session(r['user_id'] for r in pending)
+            shard_rows = {}
+            for r in pending:
+                shard_rows.setdefault(performance_router.shard_index(r['user_id']), []).append(
+                    {'flashcard_id': card_ids[r['flashcard_id']], 'user_id': user_keys[r['user_id']], 'status': r['status'],
+                     'timestamp': r['timestamp'] or datetime.utcnow()})
+            for index, rows in shard_rows.items():
+                performance_router.session(index).execute(insert(PerformanceRecord), rows)
+            counts['performance_records'] += len(pending)
+        elif pending_type == 'schedule':
+            shard_rows = {}
+            for r in pending:
+                shard_rows.setdefault(performance_router.shard_index(r['user_id']), []).append(
+                    {'user_id': r['user_id'], 'flashcard_id': card_ids[r['flashcard_id']], 'set_id': set_ids[r['set_id']],
+                     'repetitions': r['repetitions'], 'interval_days': r['interval_days'],
+                     'ease_factor': r['ease_factor'], 'due_at': r['due_at'], 'last_reviewed_at': r['last_reviewed_at']})
+            for index, rows in shard_rows.items():
+                performance_router.session(index).execute(insert(CardSchedule), rows)
+            counts['schedules'] += len(pending)
+        # Shards read the new cards through the attached primary, so it commits first
+        db.session.commit()
+        for session in performance_router.sessions():
+            session.commit()
+        db.session.expunge_all()
+        pending.clear()
+    
+    try:
+        for line_number, record in records:
+            record = validate_import_record(line_number, record)
+            record_type = record['type']
+            if record_type == 'header':
+                if record.get('format') != EXPORT_FORMAT:
+                    raise ValueError(f"Unsupported export format: {record.get('format')}")
+                continue
+            if record_type not in ('set', 'card', 'performance', 'schedule'):
+                counts['skipped'] += 1
+                continue
+            if record_type != pending_type or len(pending) >= chunk_size:
+                # Switching type also flushes parents, so their new ids are known below
+                flush()
+                pending_type = record_type
+            # Drop children whose parent was not part of the import
+            if (record_type == 'card' and record.get('set_id') not in set_ids) or \
+                    (record_type in ('performance', 'schedule') and record.get('flashcard_id') not in card_ids):
+                counts['skipped'] += 1
+                continue
+            pending.append(record)
+        flush()
+        # Imported sets are new, so their rollups can be built straight from the raw rows
+        new_set_ids = list(set_ids.values())
+        for session in performance_router.sessions():
+            for start in range(0, len(new_set_ids), chunk_size):
+                backfill_daily_performance(session, new_set_ids[start:start + chunk_size])
+                session.commit()
+        run = db.session.get(DataImport, import_id)
+        run.status = 'completed'
+        run.finished_at = datetime.utcnow()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        for session in performance_router.sessions():
+            session.rollback()
+        try:
+            rollback_import(import_id)
+        except Exception as e:
+            logger.error(f"Rolling back import {import_id} failed: {e}")
+        raise
+    
+    return counts
+
+def rollback_import(import_id):
+    """
+    Delete every set an import run created, with their cards and study data
+
+    Returns:
+        int: Number of sets deleted, or None if the run does not exist
+    """
+    run = db.session.get(DataImport, import_id)
+    if run is None:
+        return None
+    set_ids = db.session.scalars(select(FlashcardSet.id).where(FlashcardSet.import_id == import_id)).all()
+    deleted = delete_flashcard_sets(set_ids)
+    run.status = 'rolled_back'
+    run.finished_at = datetime.utcnow()
+    db.session.commit()
+    return deleted
+
 # API Endpoints
 @app.route('/api/upload_and_generate', methods=['POST'])
+@admission_controlled(generation_limiter, heavy_rate_limiter)
 def upload_and_generate():
     try:
         print("Received upload request")  # Debug logging
         
-        # Check if file is provided
-        if 'file' not in request.files and 'text' not in request.form:
-            return jsonify({'error': 'No file or text provided'}), 400
-        
-        text = ""
-        title = "Untitled Flashcard Set"
-        
-        # Handle file upload
-        if 'file' in request.files and request.files['file'].filename:
-            file = request.files['file']
-            if file.filename.endswith('.pdf'):
-                filename = file.filename
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(filepath)
-                text = extract_text_from_pdf(filepath)
-                title = filename.replace('.pdf', '')
-                # Clean up uploaded file
-                os.remove(filepath)
-            else:
-                return jsonify({'error': 'Only PDF files are supported'}), 400
-        
-        # Handle raw text input
-        elif 'text' in request.form:
-            text = request.form['text']
-            title = request.form.get('title', 'Text-based Flashcard Set')
+        text, title, limit, error = read_generation_request()
+        if error:
+            return jsonify({'error': error}), 400
         
-        if not text or len(text.strip()) < 50:
-            return jsonify({'error': 'Insufficient text content for flashcard generation'}), 400
+        # Extract, deduplicate and rank candidate terms, then generate cards for the top-ranked ones
+        cards, generation_stats = generate_flashcards_for_text(text, limit)
         
-        # Extract key terms and contexts
-        terms_with_context = extract_key_terms(text)
-        
-        if not terms_with_context:
+        if not cards:
             return jsonify({'error': 'No suitable terms found for flashcard generation'}), 400
         
         # Create flashcard set
@@ -215,56 +909,157 @@ def upload_and_generate():
         db.session.add(flashcard_set)
         db.session.commit()
         
-        # Generate flashcards
-        flashcards_data = []
-        for term, context in list(terms_with_context.items())[:20]:  # Limit to 20 cards
-            question = generate_question(term, context)
-            answer = generate_answer_from_context(term, context)
-            
-            # Analyze difficulty level
-            try:
-                complexity = dl_service.analyze_text_complexity(f"{term} {context}")
-                difficulty = complexity.get('difficulty_level', 'medium')
-            except:
-                difficulty = 'medium'  # Default fallback
-            
-            flashcard = Flashcard(
-                term=term,
-                question=question,
-                answer=answer,
-                context=context,
-                difficulty_level=difficulty,
-                set_id=flashcard_set.id
-            )
+        # Save flashcards
+        flashcards = []
+        for card in cards:
+            fields = {k: v for k, v in card.items() if k != 'score'}
+            flashcard = Flashcard(set_id=flashcard_set.id, **fields)
             db.session.add(flashcard)
-            
-            flashcards_data.append({
-                'id': None,  # Will be set after commit
-                'term': term,
-                'question': question,
-                'answer': answer,
-                'context': context,
-                'difficulty_level': difficulty
-            })
+            flashcards.append((flashcard, card['score']))
         
         db.session.commit()
         
-        # Update flashcard IDs and difficulty
-        flashcards = Flashcard.query.filter_by(set_id=flashcard_set.id).all()
-        for i, flashcard in enumerate(flashcards):
-            flashcards_data[i]['id'] = flashcard.id
-            flashcards_data[i]['difficulty_level'] = flashcard.difficulty_level
+        flashcards_data = []
+        for flashcard, score in flashcards:
+            flashcards_data.append({
+                'id': flashcard.id,
+                'term': flashcard.term,
+                'question': flashcard.question,
+                'answer': flashcard.answer,
+                'context': flashcard.context,
+                'difficulty_level': flashcard.difficulty_level,
+                'score': score
+            })
         
         return jsonify({
             'set_id': flashcard_set.id,
             'title': title,
             'flashcards': flashcards_data,
-            'count': len(flashcards_data)
+            'count': len(flashcards_data),
+            **generation_stats
         })
     
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+@app.route('/api/upload_and_generate/stream', methods=['POST'])
+@admission_controlled(generation_limiter, heavy_rate_limiter)
+def upload_and_generate_stream():
+    """
+    Streaming variant of upload_and_generate
+
+    The document is processed in fixed-size, sentence-aligned chunks and each
+    card is sent as soon as it is generated, so the first card arrives after
+    one chunk whatever the document's length. Each chunk may bring the card
+    count up to the share of `limit` proportional to how far into the text it
+    ends, so cards are spread over the whole document; chunks with no quota
+    left are skipped. Terms are ranked within their chunk rather than across
+    the whole document.
+    Cards are committed in small batches. Send format=ndjson for
+    newline-delimited JSON instead of Server-Sent Events.
+    """
+    try:
+        text, title, limit, error = read_generation_request()
+        if error:
+            return jsonify({'error': error}), 400
+        stream_format = request.args.get('format', request.form.get('format', 'sse'))
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+    
+    def encode(event, payload):
+        if stream_format == 'ndjson':
+            return json.dumps({'event': event, **payload}) + '\n'
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    
+    def generate():
+        started = time.perf_counter()
+        try:
+            document = AnalyzedDocument(text)
+            
+            flashcard_set = FlashcardSet(title=title)
+            db.session.add(flashcard_set)
+            db.session.commit()
+            yield encode('set', {'set_id': flashcard_set.id, 'title': title})
+            
+            seen_keys = set()
+            candidate_count = 0
+            collapsed_count = 0
+            dedup_ms = 0
+            card_count = 0
+            first_card_ms = None
+            pending = 0
+            chunk_count = 0
+            
+            for chunk_end, chunk in iter_document_chunks(document):
+                # Cumulative share of the limit, so a chunk short on new terms passes its quota on
+                quota = math.ceil(chunk_end * limit / len(document.text)) - card_count
+                if quota <= 0:
+                    continue
+                chunk_count += 1
+                raw_candidates = extract_key_terms(chunk)
+                dedup_started = time.perf_counter()
+                candidates, _ = collapse_near_duplicates(raw_candidates)
+                candidate_count += len(raw_candidates)
+                collapsed_count += len(raw_candidates) - len(candidates)
+                
+                # Terms already carded in an earlier chunk are dropped by normalized key before ranking
+                candidates = {term: candidate for term, candidate in candidates.items()
+                              if normalize_term(term) not in seen_keys}
+                dedup_ms += (time.perf_counter() - dedup_started) * 1000
+                ranked = []
+                for term, context, score in rank_key_terms(candidates, quota, len(chunk.text)):
+                    key = normalize_term(term)
+                    if key not in seen_keys:
+                        seen_keys.add(key)
+                        ranked.append((term, context, score))
+                
+                # The chunk's difficulties are classified together, then its cards are sent one by one
+                for fields in generate_flashcard_fields(ranked):
+                    score = fields.pop('score')
+                    flashcard = Flashcard(set_id=flashcard_set.id, **fields)
+                    db.session.add(flashcard)
+                    db.session.flush()  # Assigns the id without ending the batch
+                    card_count += 1
+                    pending += 1
+                    if first_card_ms is None:
+                        first_card_ms = round((time.perf_counter() - started) * 1000, 1)
+                    
+                    yield encode('card', {
+                        'id': flashcard.id,
+                        'term': flashcard.term,
+                        'question': flashcard.question,
+                        'answer': flashcard.answer,
+                        'context': flashcard.context,
+                        'difficulty_level': flashcard.difficulty_level,
+                        'score': score
+                    })
+                    
+                    if pending >= STREAM_COMMIT_BATCH:
+                        db.session.commit()
+                        pending = 0
+            
+            db.session.commit()
+            yield encode('summary', {
+                'set_id': flashcard_set.id,
+                'title': title,
+                'count': card_count,
+                'candidate_count': candidate_count,
+                'collapsed_count': collapsed_count,
+                'dedup_overhead_ms': round(dedup_ms, 2),
+                'chunk_count': chunk_count,
+                'first_card_ms': first_card_ms,
+                'total_ms': round((time.perf_counter() - started) * 1000, 1)
+            })
+        
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Streaming generation error: {e}")
+            yield encode('error', {'error': f'Server error: {str(e)}'})
+    
+    mimetype = 'application/x-ndjson' if stream_format == 'ndjson' else 'text/event-stream'
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/record_performance', methods=['POST'])
 def record_performance():
     try:
@@ -272,6 +1067,7 @@ def record_performance():
         flashcard_id = data.get('flashcard_id')
         user_id = data.get('user_id', 'anonymous')
         status = data.get('status')  # 'correct' or 'incorrect'
+        quality = data.get('quality')  # Optional SM-2 grade (0-5)
         
         if not flashcard_id or status not in ['correct', 'incorrect']:
             return jsonify({'error': 'Invalid data provided'}), 400
@@ -281,16 +1077,25 @@ def record_performance():
         if not flashcard:
             return jsonify({'error': 'Flashcard not found'}), 404
         
-        # Record performance
+        # Record performance against the user's integer key, on the user's shard
+        session = performance_router.session_for(user_id)
         performance_record = PerformanceRecord(
             flashcard_id=flashcard_id,
-            user_id=user_id,
+            user_id=resolve_user_key(user_id),
             status=status
         )
-        db.session.add(performance_record)
-        db.session.commit()
+        session.add(performance_record)
+        
+        # Update spaced repetition state and the daily rollup in the same transaction
+        schedule = update_card_schedule(session, flashcard, user_id, status, quality)
+        increment_daily_performance(session, user_id, flashcard.set_id, status)
+        session.commit()
         
-        return jsonify({'message': 'Performance recorded successfully'})
+        return jsonify({
+            'message': 'Performance recorded successfully',
+            'next_due_at': schedule.due_at.isoformat(),
+            'interval_days': schedule.interval_days
+        })
     
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
@@ -301,8 +1106,9 @@ def get_analysis():
         user_id = request.args.get('user_id', 'anonymous')
         set_id = request.args.get('set_id')
         
-        # Base query for performance records
-        query = PerformanceRecord.query.filter_by(user_id=user_id)
+        # Base query for performance records on the user's shard (unknown users have none)
+        query = performance_router.session_for(user_id).query(PerformanceRecord).filter_by(
+            user_id=resolve_user_key(user_id, create=False))
         
         if set_id:
             # Filter by flashcard set
@@ -368,14 +1174,15 @@ def get_analysis():
                 weaknesses.append({
                     'term': term,
                     'accuracy': term_accuracy,
-                    'attempts': total
+                    'attempts': total,
+                    'flashcard_id': stats['flashcard_id']
                 })
         
         # Sort strengths and weaknesses
         strengths.sort(key=lambda x: x['accuracy'], reverse=True)
         weaknesses.sort(key=lambda x: x['accuracy'])
         
-        return jsonify({
+        analysis = {
             'total_attempts': total_attempts,
             'correct_count': correct_count,
             'incorrect_count': incorrect_count,
@@ -383,6 +1190,82 @@ def get_analysis():
             'strengths': strengths[:5],  # Top 5 strengths
             'weaknesses': weaknesses[:5],  # Top 5 weaknesses
             'term_analysis': term_analysis
+        }
+        
+        # Optional: cards from any set that resemble the weakest terms
+        related_k = min(request.args.get('related', 0, type=int), MAX_RELATED_CARDS)
+        if related_k > 0:
+            analysis['recommendations'] = find_related_flashcards(
+                [w['flashcard_id'] for w in weaknesses[:5]], related_k) if weaknesses else []
+        
+        return jsonify(analysis)
+    
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/get_analysis/timeline', methods=['GET'])
+def get_analysis_timeline():
+    """Accuracy over time from the daily rollups, bucketed by day or week"""
+    try:
+        user_id = request.args.get('user_id', 'anonymous')
+        set_id = request.args.get('set_id', type=int)
+        bucket = request.args.get('bucket', 'day')
+        
+        if bucket not in ['day', 'week']:
+            return jsonify({'error': "bucket must be 'day' or 'week'"}), 400
+        
+        try:
+            end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if 'end' in request.args \
+                else datetime.utcnow().date()
+            start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if 'start' in request.args \
+                else end - timedelta(days=365)
+        except ValueError:
+            return jsonify({'error': 'start and end must be YYYY-MM-DD dates'}), 400
+        
+        # Sum across sets per day; reads at most one rollup row per set per day
+        query = performance_router.session_for(user_id).query(
+            DailyPerformance.day,
+            db.func.sum(DailyPerformance.correct_count),
+            db.func.sum(DailyPerformance.incorrect_count)
+        ).filter(
+            DailyPerformance.user_id == user_id,
+            DailyPerformance.day >= start,
+            DailyPerformance.day <= end
+        )
+        if set_id:
+            query = query.filter(DailyPerformance.set_id == set_id)
+        rows = query.group_by(DailyPerformance.day).order_by(DailyPerformance.day).all()
+        
+        buckets = {}
+        for day, correct, incorrect in rows:
+            period_start = day - timedelta(days=day.weekday()) if bucket == 'week' else day
+            totals = buckets.setdefault(period_start, [0, 0])
+            totals[0] += correct
+            totals[1] += incorrect
+        
+        timeline = []
+        cumulative_correct = 0
+        cumulative_total = 0
+        for period_start, (correct, incorrect) in sorted(buckets.items()):
+            total = correct + incorrect
+            cumulative_correct += correct
+            cumulative_total += total
+            timeline.append({
+                'period_start': period_start.isoformat(),
+                'correct': correct,
+                'incorrect': incorrect,
+                'total': total,
+                'accuracy': round(correct / total * 100, 2) if total else 0,
+                'cumulative_accuracy': round(cumulative_correct / cumulative_total * 100, 2) if cumulative_total else 0
+            })
+        
+        return jsonify({
+            'user_id': user_id,
+            'set_id': set_id,
+            'bucket': bucket,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'timeline': timeline
         })
     
     except Exception as e:
@@ -439,6 +1322,221 @@ def get_flashcard_set(set_id):
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+@app.route('/api/next_cards', methods=['GET'])
+def get_next_cards():
+    """Get the n most-due flashcards for a user from the spaced repetition index"""
+    try:
+        user_id = request.args.get('user_id', 'anonymous')
+        set_id = request.args.get('set_id', type=int)
+        n = request.args.get('n', 10, type=int)
+        
+        if not set_id:
+            return jsonify({'error': 'set_id is required'}), 400
+        n = max(1, min(n, 100))
+        now = datetime.utcnow()
+        
+        # Schedules live on the user's shard; flashcards resolve to the attached primary
+        session = performance_router.session_for(user_id)
+        
+        # 1. Overdue cards, read in due order from the (user_id, set_id, due_at) index
+        due_rows = session.query(CardSchedule, Flashcard).join(
+            Flashcard, CardSchedule.flashcard_id == Flashcard.id
+        ).filter(
+            CardSchedule.user_id == user_id,
+            CardSchedule.set_id == set_id,
+            CardSchedule.due_at <= now
+        ).order_by(CardSchedule.due_at).limit(n).all()
+        
+        # 2. Cards the user has never reviewed
+        new_cards = []
+        remaining = n - len(due_rows)
+        if remaining > 0:
+            reviewed = session.query(CardSchedule.id).filter(
+                CardSchedule.user_id == user_id,
+                CardSchedule.flashcard_id == Flashcard.id
+            ).exists()
+            new_cards = session.query(Flashcard).filter(
+                Flashcard.set_id == set_id, ~reviewed
+            ).order_by(Flashcard.id).limit(remaining).all()
+        
+        # 3. Upcoming cards, soonest first
+        upcoming_rows = []
+        remaining -= len(new_cards)
+        if remaining > 0:
+            upcoming_rows = session.query(CardSchedule, Flashcard).join(
+                Flashcard, CardSchedule.flashcard_id == Flashcard.id
+            ).filter(
+                CardSchedule.user_id == user_id,
+                CardSchedule.set_id == set_id,
+                CardSchedule.due_at > now
+            ).order_by(CardSchedule.due_at).limit(remaining).all()
+        
+        cards_data = []
+        for schedule, flashcard in due_rows + [(None, f) for f in new_cards] + upcoming_rows:
+            cards_data.append({
+                'id': flashcard.id,
+                'term': flashcard.term,
+                'question': flashcard.question,
+                'answer': flashcard.answer,
+                'context': flashcard.context,
+                'difficulty_level': flashcard.difficulty_level,
+                'is_new': schedule is None,
+                'due_at': schedule.due_at.isoformat() if schedule else None,
+                'interval_days': schedule.interval_days if schedule else 0,
+                'ease_factor': schedule.ease_factor if schedule else sr_scheduler.DEFAULT_EASE_FACTOR,
+                'repetitions': schedule.repetitions if schedule else 0
+            })
+        
+        return jsonify({
+            'user_id': user_id,
+            'set_id': set_id,
+            'cards': cards_data,
+            'count': len(cards_data),
+            'due_count': len(due_rows)
+        })
+    
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/search', methods=['GET'])
+def search():
+    """Full-text search across all flashcards (FTS5, bm25-ranked)"""
+    try:
+        query = request.args.get('q', '').strip()
+        set_id = request.args.get('set_id', type=int)
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = max(1, min(request.args.get('per_page', 20, type=int), 100))
+        
+        if not query:
+            return jsonify({'error': 'No search query provided'}), 400
+        
+        with db.engine.connect() as conn:
+            result = search_flashcards(conn, query, set_id=set_id, page=page, per_page=per_page)
+        
+        result['query'] = query
+        result['count'] = len(result['results'])
+        return jsonify(result)
+    
+    except Exception as e:
+        return jsonify({'error': f'Search failed: {str(e)}'}), 500
+
+@app.route('/api/flashcards/<int:flashcard_id>/related', methods=['GET'])
+def get_related_flashcards(flashcard_id):
+    """Cards from any set with the most similar term and context (TF-IDF cosine)"""
+    try:
+        k = max(1, min(request.args.get('k', DEFAULT_RELATED_CARDS, type=int), MAX_RELATED_CARDS))
+        
+        flashcard = Flashcard.query.get(flashcard_id)
+        if not flashcard:
+            return jsonify({'error': 'Flashcard not found'}), 404
+        
+        related = find_related_flashcards([flashcard_id], k)
+        return jsonify({
+            'flashcard_id': flashcard_id,
+            'term': flashcard.term,
+            'related': related,
+            'count': len(related)
+        })
+    
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/export', methods=['GET'])
+def export_data():
+    """Stream sets, cards and performance history as gzip-compressed NDJSON"""
+    try:
+        set_ids = request.args.getlist('set_id', type=int)
+        filename = f"uknow-export-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.ndjson.gz"
+        return Response(
+            stream_with_context(gzip_ndjson_stream(iter_export_records(set_ids or None))),
+            mimetype='application/gzip',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+    except Exception as e:
+        return jsonify({'error': f'Export failed: {str(e)}'}), 500
+
+@app.route('/api/import', methods=['POST'])
+def import_data():
+    """Import an export stream (gzip or plain NDJSON) as request body or 'file' upload"""
+    try:
+        stream = request.files['file'].stream if 'file' in request.files else request.stream
+        counts = import_records(read_ndjson(stream))
+        return jsonify({'message': 'Import completed successfully', **counts})
+    except ValueError as e:
+        return jsonify({'error': f'Invalid import data: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'Import failed: {str(e)}'}), 500
+
+def delete_flashcard_sets(set_ids, chunk_size=500):
+    """
+    Delete sets with set-based SQL; cards, performance records, schedules and
+    rollups go with them through ON DELETE CASCADE
+
+    Shard files cannot hold foreign keys into the primary database, so when
+    sharded their rows are deleted first, while the cards they reference
+    still exist. Each database commits separately.
+
+    Returns:
+        int: Number of sets deleted
+    """
+    deleted = 0
+    set_ids = list(set_ids)
+    chunks = [set_ids[start:start + chunk_size] for start in range(0, len(set_ids), chunk_size)]
+    if performance_router.sharded:
+        for session in performance_router.sessions():
+            for chunk in chunks:
+                set_cards = select(Flashcard.id).where(Flashcard.set_id.in_(chunk))
+                for statement in (delete(PerformanceRecord).where(PerformanceRecord.flashcard_id.in_(set_cards)),
+                                  delete(CardSchedule).where(CardSchedule.set_id.in_(chunk)),
+                                  delete(DailyPerformance).where(DailyPerformance.set_id.in_(chunk))):
+                    session.execute(statement, execution_options={'synchronize_session': False})
+            session.commit()
+    for chunk in chunks:
+        result = db.session.execute(
+            delete(FlashcardSet).where(FlashcardSet.id.in_(chunk)),
+            execution_options={'synchronize_session': False}
+        )
+        deleted += result.rowcount
+    db.session.commit()
+    return deleted
+
+@app.route('/api/flashcard_sets/<int:set_id>', methods=['DELETE'])
+def delete_flashcard_set(set_id):
+    """Delete a flashcard set and everything that belongs to it"""
+    try:
+        card_count = db.session.query(db.func.count(Flashcard.id)).filter(Flashcard.set_id == set_id).scalar()
+        if not delete_flashcard_sets([set_id]):
+            return jsonify({'error': 'Flashcard set not found'}), 404
+        
+        return jsonify({
+            'message': 'Flashcard set deleted successfully',
+            'set_id': set_id,
+            'deleted_flashcards': card_count
+        })
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/flashcard_sets/batch_delete', methods=['POST'])
+def batch_delete_flashcard_sets():
+    """Delete several flashcard sets in one request: {set_ids: [...]}"""
+    try:
+        set_ids = (request.json or {}).get('set_ids')
+        if not isinstance(set_ids, list) or not all(isinstance(i, int) for i in set_ids):
+            return jsonify({'error': 'set_ids must be a list of integers'}), 400
+        
+        deleted = delete_flashcard_sets(set_ids)
+        return jsonify({
+            'message': 'Flashcard sets deleted successfully',
+            'requested': len(set_ids),
+            'deleted_sets': deleted
+        })
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
 # API Endpoints
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -446,6 +1544,7 @@ def health_check():
     return jsonify({'status': 'OK', 'message': 'UKnow backend is running!'})
 
 @app.route('/api/summarize', methods=['POST'])
+@admission_controlled(summarize_limiter, heavy_rate_limiter)
 def summarize_content():
     """AI-Powered Summarization endpoint"""
     try:
@@ -457,15 +1556,18 @@ def summarize_content():
         if not text:
             return jsonify({'error': 'No text provided for summarization'}), 400
         
+        # Shared analysis for summarization and complexity scoring
+        document = AnalyzedDocument(text)
+        
         # Generate summary using Deep Learning Service
         summary = dl_service.summarize_text(
-            text=text,
+            text=document,
             sentence_count=sentence_count,
             method=method
         )
         
         # Analyze complexity
-        complexity = dl_service.analyze_text_complexity(text)
+        complexity = dl_service.analyze_text_complexity(document)
         
         return jsonify({
             'summary': summary,
@@ -482,6 +1584,7 @@ def summarize_content():
         return jsonify({'error': f'Summarization failed: {str(e)}'}), 500
 
 @app.route('/api/translate', methods=['POST'])
+@admission_controlled(translate_limiter, heavy_rate_limiter)
 def translate_content():
     """Neural Machine Translation endpoint"""
     try:
@@ -506,6 +1609,14 @@ def translate_content():
         logger.error(f"Translation API error: {e}")
         return jsonify({'error': f'Translation failed: {str(e)}'}), 500
 
+@app.route('/api/admission_stats', methods=['GET'])
+def get_admission_stats():
+    """Queue depth, active requests and rejection counts for rate-limited endpoints"""
+    return jsonify({
+        'limiters': {limiter.name: limiter.stats() for limiter in ADMISSION_LIMITERS},
+        'rate_limit': heavy_rate_limiter.stats()
+    })
+
 @app.route('/api/supported_languages', methods=['GET'])
 def get_supported_languages():
     """Get list of supported translation languages"""
@@ -523,6 +1634,130 @@ def create_tables():
     db.create_all()
 
 # Database Migration Functions
+def _foreign_keys_outdated(cursor, table):
+    """Whether an existing SQLite table lacks the ON DELETE actions its model declares"""
+    # foreign_key_list rows: id, seq, table, from, to, on_update, on_delete, match
+    existing = {(row[3], row[2]): row[6].upper() for row in cursor.execute(f"PRAGMA foreign_key_list({table.name})")}
+    for fk in table.foreign_keys:
+        expected = (fk.ondelete or 'NO ACTION').upper()
+        if existing.get((fk.parent.name, fk.column.table.name)) != expected:
+            return True
+    return False
+
+def _autoincrement_missing(cursor, table):
+    """Whether a model declares sqlite_autoincrement but the existing table was created without it"""
+    if not table.kwargs.get('sqlite_autoincrement'):
+        return False
+    row = cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)).fetchone()
+    return 'AUTOINCREMENT' not in row[0].upper()
+
+def _rebuild_table(cursor, table, source=None, expressions=None):
+    """
+    Recreate a table from its model definition (create, copy, drop, rename)
+
+    Columns are copied by name from source (default: the table itself);
+    expressions overrides the SQL selected for individual columns. The caller
+    owns the transaction and the foreign_keys pragma.
+    """
+    new_name = f"{table.name}__rebuild"
+    ddl = str(CreateTable(table).compile(db.engine)).strip()
+    ddl = re.sub(rf'^CREATE TABLE "?{table.name}"?', f'CREATE TABLE "{new_name}"', ddl, count=1)
+    cursor.execute(ddl)
+    
+    old_columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table.name})")}
+    columns = [c.name for c in table.columns if c.name in old_columns]
+    selected = ', '.join((expressions or {}).get(name, f"{table.name}.{name}") for name in columns)
+    cursor.execute(f'INSERT INTO "{new_name}" ({", ".join(columns)}) '
+                   f'SELECT {selected} FROM {source or table.name}')
+    cursor.execute(f"DROP TABLE {table.name}")
+    cursor.execute(f'ALTER TABLE "{new_name}" RENAME TO {table.name}')
+    for index in table.indexes:
+        cursor.execute(str(CreateIndex(index).compile(db.engine)))
+
+def _remove_orphaned_rows(cursor):
+    """Remove (or null out) rows whose parent no longer exists, per the constraint's action"""
+    for table_name, rowid, _, fk_id in cursor.execute("PRAGMA foreign_key_check").fetchall():
+        fk = next(row for row in cursor.execute(f"PRAGMA foreign_key_list({table_name})") if row[0] == fk_id)
+        if fk[6].upper() == 'SET NULL':
+            cursor.execute(f"UPDATE {table_name} SET {fk[3]} = NULL WHERE rowid = ?", (rowid,))
+        else:
+            cursor.execute(f"DELETE FROM {table_name} WHERE rowid = ?", (rowid,))
+
+def migrate_performance_record_users():
+    """
+    Replace the free-form user_id strings on performance_record with integer
+    keys into the user table
+
+    Every distinct identifier gets a user row (first seen time as created_at),
+    then the table is rebuilt with the keys joined in. Returns the number of
+    records converted, or None when the table is already keyed.
+    """
+    raw = db.engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        column_types = {row[1]: row[2].upper() for row in cursor.execute("PRAGMA table_info(performance_record)")}
+        if column_types.get('user_id', 'INTEGER').startswith('INT'):
+            return None
+        
+        cursor.execute("PRAGMA foreign_keys=OFF")
+        cursor.execute("BEGIN")
+        cursor.execute("""
+            INSERT OR IGNORE INTO user (external_id, created_at)
+            SELECT user_id, MIN(COALESCE(timestamp, CURRENT_TIMESTAMP))
+            FROM performance_record
+            GROUP BY user_id
+        """)
+        _rebuild_table(cursor, PerformanceRecord.__table__,
+                       source="performance_record JOIN user ON user.external_id = performance_record.user_id",
+                       expressions={'user_id': 'user.id'})
+        _remove_orphaned_rows(cursor)
+        converted = cursor.execute("SELECT COUNT(*) FROM performance_record").fetchone()[0]
+        cursor.execute("COMMIT")
+        return converted
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.cursor().execute("PRAGMA foreign_keys=ON")
+        raw.close()
+
+def rebuild_tables_for_foreign_keys(models):
+    """
+    Recreate tables whose foreign keys predate ON DELETE CASCADE, or whose
+    model has since declared AUTOINCREMENT
+
+    SQLite cannot alter constraints, so each outdated table is copied into a
+    freshly created one (create, copy, drop, rename) with foreign keys
+    disabled. Rows left orphaned by earlier deletes are then cleaned up
+    according to the constraint's action.
+    """
+    raw = db.engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        existing_tables = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        outdated = [m.__table__ for m in models
+                    if m.__table__.name in existing_tables and (_foreign_keys_outdated(cursor, m.__table__)
+                                                                or _autoincrement_missing(cursor, m.__table__))]
+        if not outdated:
+            return []
+        
+        cursor.execute("PRAGMA foreign_keys=OFF")
+        cursor.execute("BEGIN")
+        for table in outdated:
+            print(f"Rebuilding {table.name} from its model definition...")
+            _rebuild_table(cursor, table)
+        
+        _remove_orphaned_rows(cursor)
+        cursor.execute("COMMIT")
+        return [table.name for table in outdated]
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        # The connection goes back to the pool, so restore enforcement
+        raw.cursor().execute("PRAGMA foreign_keys=ON")
+        raw.close()
+
 def migrate_database():
     """Apply database migrations for new schema changes"""
     try:
@@ -538,10 +1773,264 @@ def migrate_database():
             print("difficulty_level column added successfully")
         else:
             print("difficulty_level column already exists")
+        
+        # Import run marker on sets (import_records)
+        set_columns = [column['name'] for column in inspector.get_columns('flashcard_set')]
+        if 'import_id' not in set_columns:
+            with db.engine.connect() as conn:
+                conn.execute(db.text("ALTER TABLE flashcard_set ADD COLUMN import_id INTEGER "
+                                     "REFERENCES data_import (id) ON DELETE SET NULL"))
+                conn.execute(db.text("CREATE INDEX IF NOT EXISTS ix_flashcard_set_import_id ON flashcard_set (import_id)"))
+                conn.commit()
+            print("Added import_id column to flashcard_set table")
+        
+        # Integer user keys on performance records (must run before the foreign
+        # key rebuild, which copies columns verbatim)
+        converted = migrate_performance_record_users()
+        if converted is not None:
+            print(f"Converted {converted} performance records to integer user keys")
+        
+        # ON DELETE CASCADE foreign keys for set-level deletes and AUTOINCREMENT
+        # flashcard ids (drops the search triggers on flashcard, which are
+        # recreated below)
+        rebuilt = rebuild_tables_for_foreign_keys(
+            [Flashcard, PerformanceRecord, CardSchedule, DailyPerformance, ImportedDocument])
+        if rebuilt:
+            print(f"Rebuilt tables: {', '.join(rebuilt)}")
+        
+        # Index used by set lookups and the spaced repetition queue
+        with db.engine.connect() as conn:
+            conn.execute(db.text("CREATE INDEX IF NOT EXISTS ix_flashcard_set_id ON flashcard (set_id)"))
+            conn.commit()
+        
+        # Full-text search index, kept in sync with flashcard by triggers
+        with db.engine.connect() as conn:
+            if create_search_index(conn):
+                print("Created flashcard search index, indexing existing flashcards...")
+                rebuild_search_index(conn)
+            conn.commit()
+        
+        # Change log the related cards index catches up from, also kept by triggers
+        with db.engine.connect() as conn:
+            create_change_log(conn)
+            conn.commit()
+        
+        # Shard files for per-user study data, when configured
+        performance_router.create_all()
+        if performance_router.sharded and db.session.query(PerformanceRecord.id).first() is not None:
+            print("Unsharded performance records found, run 'flask rebalance-shards' to move them to their shards")
+        
+        # Daily rollups start empty on databases that predate them
+        for session in performance_router.sessions():
+            has_records = session.query(PerformanceRecord.id).first() is not None
+            has_rollups = session.query(DailyPerformance.id).first() is not None
+            if has_records and not has_rollups:
+                print("Backfilling daily performance rollups...")
+                backfill_daily_performance(session)
+                session.commit()
             
     except Exception as e:
         print(f"Migration error: {e}")
 
+# Shard Rebalancing Functions
+SHARD_USERS_SQL = """
+    SELECT u.external_id FROM (SELECT DISTINCT user_id FROM performance_record) r JOIN user u ON u.id = r.user_id
+    UNION SELECT user_id FROM daily_performance
+    UNION SELECT user_id FROM card_schedule
+"""
+
+def _shard_tables():
+    """(table, parent filter) for each table that holds per-user study data"""
+    return [
+        (PerformanceRecord.__table__, PerformanceRecord.flashcard_id.in_(select(Flashcard.id))),
+        (DailyPerformance.__table__, DailyPerformance.set_id.in_(select(FlashcardSet.id))),
+        (CardSchedule.__table__, CardSchedule.flashcard_id.in_(select(Flashcard.id)))
+    ]
+
+def _move_user_rows(source, target, external_id):
+    """
+    Merge one user's study data from the source database into the target,
+    then delete it at the source
+
+    Records already present on the target (same card, status and timestamp)
+    are not copied again, schedules keep whichever side was reviewed last and
+    rollups are rebuilt from the merged records, so answers recorded on the
+    target in the meantime are kept and repeating an interrupted move is
+    safe. Rows whose card no longer exists are not copied.
+
+    Returns:
+        int: Performance records copied
+    """
+    user_key = resolve_user_key(external_id, create=False)
+    records, schedules = PerformanceRecord.__table__, CardSchedule.__table__
+    
+    with source.connect() as conn:
+        source_records = conn.execute(select(records.c.flashcard_id, records.c.status, records.c.timestamp).where(
+            records.c.user_id == user_key, records.c.flashcard_id.in_(select(Flashcard.id)))).all()
+        source_schedules = conn.execute(select(*[c for c in schedules.columns if c.name != 'id']).where(
+            schedules.c.user_id == external_id, schedules.c.flashcard_id.in_(select(Flashcard.id)))).mappings().all()
+    
+    with target.begin() as conn:
+        present = Counter(tuple(row) for row in conn.execute(
+            select(records.c.flashcard_id, records.c.status, records.c.timestamp).where(records.c.user_id == user_key)))
+        copied = []
+        for row in source_records:
+            if present[tuple(row)]:
+                present[tuple(row)] -= 1
+            else:
+                copied.append({'flashcard_id': row.flashcard_id, 'user_id': user_key,
+                               'status': row.status, 'timestamp': row.timestamp})
+        if copied:
+            conn.execute(insert(records), copied)
+        if source_schedules:
+            statement = sqlite_insert(schedules)
+            conn.execute(statement.on_conflict_do_update(
+                index_elements=['user_id', 'flashcard_id'],
+                set_={name: statement.excluded[name] for name in source_schedules[0].keys()},
+                where=db.or_(schedules.c.last_reviewed_at.is_(None),
+                             statement.excluded.last_reviewed_at > schedules.c.last_reviewed_at)
+            ), [dict(row) for row in source_schedules])
+        conn.execute(delete(DailyPerformance.__table__).where(DailyPerformance.user_id == external_id))
+        conn.execute(db.text(BACKFILL_DAILY_PERFORMANCE_SQL.format(where="WHERE r.user_id = :user_key")),
+                     {'user_key': user_key})
+    
+    with source.begin() as conn:
+        conn.execute(delete(records).where(records.c.user_id == user_key))
+        conn.execute(delete(schedules).where(schedules.c.user_id == external_id))
+        conn.execute(delete(DailyPerformance.__table__).where(DailyPerformance.user_id == external_id))
+    return len(copied)
+
+def _remove_orphaned_shard_rows(engine):
+    """Delete shard rows whose card or set is gone (e.g. a set delete that failed halfway)"""
+    removed = 0
+    with engine.begin() as conn:
+        for table, parent_exists in _shard_tables():
+            removed += conn.execute(delete(table).where(~parent_exists)).rowcount
+    return removed
+
+def rebalance_performance_shards(dry_run=False):
+    """
+    Move every user's study data to the database the current
+    PERFORMANCE_SHARDS setting assigns it
+
+    Sources are every shard file on disk (including ones beyond the
+    configured count) and, when sharded, the primary database. Jump hashing
+    means growing from N to N+1 shards moves only about 1/(N+1) of the
+    users. Each user is copied in one transaction and removed from the source
+    in another, so an interrupted run can simply be repeated. Run it with the
+    server stopped.
+
+    Returns:
+        dict: Users and performance records moved, and orphaned shard rows removed
+    """
+    if not dry_run:
+        performance_router.create_all()
+    sources = [performance_router.engine_for_path(path) for path in performance_router.existing_shard_paths()]
+    if performance_router.sharded:
+        sources.insert(0, db.engine)
+    
+    stats = {'users_moved': 0, 'records_moved': 0, 'orphans_removed': 0}
+    for source in sources:
+        if source is not db.engine and not dry_run:
+            stats['orphans_removed'] += _remove_orphaned_shard_rows(source)
+        with source.connect() as conn:
+            external_ids = conn.execute(db.text(SHARD_USERS_SQL)).scalars().all()
+        for external_id in external_ids:
+            target = performance_router.engine(performance_router.shard_index(external_id))
+            if target is source:
+                continue
+            stats['users_moved'] += 1
+            if not dry_run:
+                stats['records_moved'] += _move_user_rows(source, target, external_id)
+    return stats
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Rebuild the flashcard full-text search index from existing data"""
+    with db.engine.connect() as conn:
+        create_search_index(conn)
+        rebuild_search_index(conn)
+        conn.commit()
+    print("Flashcard search index rebuilt")
+
+@app.cli.command('rebuild-related-index')
+def rebuild_related_index_command():
+    """Rebuild the related cards TF-IDF index from all flashcards"""
+    started = time.perf_counter()
+    with db.engine.connect() as conn:
+        create_change_log(conn)
+        conn.commit()
+        related_index.rebuild(conn)
+    print(f"Indexed {len(related_index)} flashcards in {time.perf_counter() - started:.1f}s")
+
+@app.cli.command('backfill-daily-performance')
+def backfill_daily_performance_command():
+    """Rebuild the daily performance rollups from all performance records"""
+    started = time.perf_counter()
+    rows = 0
+    for session in performance_router.sessions():
+        backfill_daily_performance(session)
+        session.commit()
+        rows += session.query(db.func.count(DailyPerformance.id)).scalar()
+    print(f"Built {rows} daily rollup rows in {time.perf_counter() - started:.1f}s")
+
+@app.cli.command('rebalance-shards')
+@click.option('--dry-run', is_flag=True, help='Only count the users that would move')
+def rebalance_shards_command(dry_run):
+    """Move study data to the shards PERFORMANCE_SHARDS assigns (stop the server first)"""
+    started = time.perf_counter()
+    stats = rebalance_performance_shards(dry_run=dry_run)
+    if dry_run:
+        print(f"{stats['users_moved']} users would move across {performance_router.shard_count} shard(s)")
+        return
+    print(f"Moved {stats['users_moved']} users ({stats['records_moved']} performance records) and removed "
+          f"{stats['orphans_removed']} orphaned rows in {time.perf_counter() - started:.1f}s")
+    configured = {performance_router.shard_path(i) for i in range(performance_router.shard_count)} \
+        if performance_router.sharded else set()
+    unused = [path for path in performance_router.existing_shard_paths() if path not in configured]
+    if unused:
+        print(f"No longer used and now empty (safe to delete): {', '.join(unused)}")
+
+@app.cli.command('export-data')
+@click.argument('output_path')
+@click.option('--set-id', 'set_ids', type=int, multiple=True, help='Only export these sets')
+def export_data_command(output_path, set_ids):
+    """Export sets, cards and performance history to a .ndjson.gz file"""
+    written = 0
+    with open(output_path, 'wb') as f:
+        for chunk in gzip_ndjson_stream(iter_export_records(list(set_ids) or None)):
+            f.write(chunk)
+            written += len(chunk)
+    print(f"Exported {written / (1024 * 1024):.1f} MB to {output_path}")
+
+@app.cli.command('import-data')
+@click.argument('input_path')
+def import_data_command(input_path):
+    """Import a file produced by export-data (gzip or plain NDJSON)"""
+    with open(input_path, 'rb') as f:
+        counts = import_records(read_ndjson(f))
+    print(f"Imported {counts['sets']} sets, {counts['cards']} cards, "
+          f"{counts['performance_records']} performance records and {counts['schedules']} review schedules "
+          f"({counts['skipped']} skipped) "
+          f"as import {counts['import_id']}")
+
+@app.cli.command('rollback-import')
+@click.argument('import_id', type=int, required=False)
+def rollback_import_command(import_id):
+    """Delete the sets of an import run; without an id, list runs that never completed"""
+    if import_id is None:
+        runs = DataImport.query.filter(DataImport.status == 'running').order_by(DataImport.id).all()
+        for run in runs:
+            print(f"Import {run.id} started {run.started_at.isoformat()} did not complete")
+        if not runs:
+            print("No unfinished imports")
+        return
+    deleted = rollback_import(import_id)
+    if deleted is None:
+        print(f"Import {import_id} not found")
+    else:
+        print(f"Rolled back import {import_id}: deleted {deleted} sets")
+
 if __name__ == '__main__':
     print("Starting UKnow backend server...")
     try:
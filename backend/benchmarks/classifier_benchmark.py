@@ -0,0 +1,116 @@
+"""
+Latency/throughput benchmark for the in-process difficulty classifier
+
+Compares per-item inference (one forward pass per text), a single caller
+waiting on classify() for each text, concurrent requests gathered into
+micro-batches and classify_many() over one document's cards, for fp32 and
+dynamic int8 models.
+Any saved sequence-classification checkpoint works, e.g. ./custom-fine-tuned.
+
+Usage (from backend/):
+    python -m benchmarks.classifier_benchmark ./custom-fine-tuned --requests 512 --concurrency 32
+"""
+
+import argparse
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from deep_learning_service import BatchedTextClassifier
+
+SAMPLE_WORDS = (
+    "the neural network learns representations from data using gradient descent and "
+    "backpropagation while regularization prevents overfitting on the training set"
+).split()
+
+def sample_texts(count, seed=42):
+    rng = random.Random(seed)
+    return [' '.join(rng.choice(SAMPLE_WORDS) for _ in range(rng.randint(8, 60))) for _ in range(count)]
+
+def summarize(name, latencies, elapsed, count):
+    latencies = sorted(latencies)
+    return {
+        'mode': name,
+        'throughput': round(count / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+    }
+
+def bench_per_item(classifier, texts):
+    latencies = []
+    start = time.perf_counter()
+    for text in texts:
+        t = time.perf_counter()
+        classifier.predict([text])
+        latencies.append(time.perf_counter() - t)
+    return latencies, time.perf_counter() - start
+
+def bench_sequential(classifier, texts):
+    # One caller waiting for each result, so every text runs as a batch of one
+    latencies = []
+    start = time.perf_counter()
+    for text in texts:
+        t = time.perf_counter()
+        classifier.classify(text)
+        latencies.append(time.perf_counter() - t)
+    return latencies, time.perf_counter() - start
+
+def bench_classify_many(classifier, texts, group_size):
+    # The generation path: one call per document with all of its cards
+    latencies = []
+    start = time.perf_counter()
+    for i in range(0, len(texts), group_size):
+        group = texts[i:i + group_size]
+        t = time.perf_counter()
+        classifier.classify_many(group)
+        latencies.extend([time.perf_counter() - t] * len(group))
+    return latencies, time.perf_counter() - start
+
+def bench_micro_batched(classifier, texts, concurrency):
+    def timed(text):
+        t = time.perf_counter()
+        classifier.classify(text)
+        return time.perf_counter() - t
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(timed, texts))
+    return latencies, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched vs. per-item classifier inference")
+    parser.add_argument('model_path')
+    parser.add_argument('--requests', type=int, default=512)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--max-batch-size', type=int, default=16)
+    parser.add_argument('--max-wait-ms', type=float, default=10)
+    parser.add_argument('--cards-per-document', type=int, default=20, help="Texts per classify_many() call")
+    args = parser.parse_args()
+
+    texts = sample_texts(args.requests)
+    results = []
+    for quantize in (False, True):
+        classifier = BatchedTextClassifier(args.model_path, quantize=quantize,
+                                           max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+        classifier.predict(texts[:args.max_batch_size])  # Warm-up
+        precision = 'int8' if quantize else 'fp32'
+
+        latencies, elapsed = bench_per_item(classifier, texts)
+        results.append({'precision': precision, **summarize('per-item', latencies, elapsed, len(texts))})
+
+        latencies, elapsed = bench_sequential(classifier, texts)
+        results.append({'precision': precision, **summarize('sequential', latencies, elapsed, len(texts))})
+
+        latencies, elapsed = bench_micro_batched(classifier, texts, args.concurrency)
+        results.append({'precision': precision, **summarize('micro-batched', latencies, elapsed, len(texts))})
+
+        latencies, elapsed = bench_classify_many(classifier, texts, args.cards_per_document)
+        results.append({'precision': precision, **summarize('classify_many', latencies, elapsed, len(texts))})
+
+    print(f"{'precision':<10}{'mode':<15}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for r in results:
+        print(f"{r['precision']:<10}{r['mode']:<15}{r['throughput']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Set deletion benchmark: ORM cascade vs. SQL ON DELETE CASCADE
+
+Creates throwaway sets with many cards and performance records using the
+app's own table definitions, then deletes one set the old way (load every
+card and record into the session and delete them one by one) and one with
+a single set-based DELETE that cascades in SQLite.
+
+Usage (from backend/):
+    python -m benchmarks.delete_benchmark --attempts 100000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, insert, delete, select, func
+from sqlalchemy.orm import Session
+
+from app import db, FlashcardSet, Flashcard, PerformanceRecord, User
+from search_index import create_search_index
+
+def populate(engine, cards, attempts):
+    """Insert one set with `cards` cards and `attempts` performance records; returns its id"""
+    rng = random.Random(42)
+    with Session(engine) as session:
+        flashcard_set = FlashcardSet(title='Benchmark Set')
+        session.add(flashcard_set)
+        session.flush()
+        set_id = flashcard_set.id
+
+        session.execute(insert(Flashcard), [{
+            'term': f'term {i}', 'question': f'What is term {i}?', 'answer': 'An answer.',
+            'context': 'Some context sentence.', 'difficulty_level': 'medium', 'set_id': set_id
+        } for i in range(cards)])
+        card_ids = session.scalars(select(Flashcard.id).where(Flashcard.set_id == set_id)).all()
+        user_ids = session.scalars(select(User.id)).all()
+        if not user_ids:
+            session.execute(insert(User), [{'external_id': f'user-{i}'} for i in range(1, 51)])
+            user_ids = session.scalars(select(User.id)).all()
+
+        start = datetime.utcnow() - timedelta(days=365)
+        for offset in range(0, attempts, 10000):
+            session.execute(insert(PerformanceRecord), [{
+                'flashcard_id': rng.choice(card_ids), 'user_id': rng.choice(user_ids),
+                'status': rng.choice(['correct', 'incorrect']),
+                'timestamp': start + timedelta(minutes=rng.randint(0, 525600))
+            } for _ in range(min(10000, attempts - offset))])
+        session.commit()
+    return set_id
+
+def delete_with_orm(engine, set_id):
+    """What deleting a set cost before: every child row is loaded and deleted individually"""
+    with engine.connect() as conn:
+        # Foreign keys were not enforced then, so SQL must not cascade ahead of the ORM.
+        # SQLite ignores this pragma inside a transaction, so it is set before one begins
+        raw = conn.connection.driver_connection
+        assert not raw.in_transaction
+        raw.execute("PRAGMA foreign_keys=OFF")
+        assert raw.execute("PRAGMA foreign_keys").fetchone()[0] == 0, "foreign keys still enforced"
+        try:
+            with Session(bind=conn) as session:
+                flashcard_set = session.get(FlashcardSet, set_id)
+                with session.no_autoflush:
+                    for card in flashcard_set.flashcards:
+                        for record in card.performance_records:
+                            session.delete(record)
+                        session.delete(card)
+                    session.delete(flashcard_set)
+                session.commit()
+        finally:
+            # The connection goes back to the pool, so restore enforcement
+            raw.execute("PRAGMA foreign_keys=ON")
+
+def delete_with_sql(engine, set_id):
+    with Session(engine) as session:
+        session.execute(delete(FlashcardSet).where(FlashcardSet.id == set_id),
+                        execution_options={'synchronize_session': False})
+        session.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark flashcard set deletion strategies")
+    parser.add_argument('--cards', type=int, default=500, help="Cards per set")
+    parser.add_argument('--attempts', type=int, default=100000, help="Performance records per set")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmpdir, 'delete_bench.db')}")
+        db.metadata.create_all(engine)
+        with engine.begin() as conn:
+            create_search_index(conn)
+
+        results = {}
+        for name, strategy in (('ORM cascade', delete_with_orm), ('SQL ON DELETE CASCADE', delete_with_sql)):
+            set_id = populate(engine, args.cards, args.attempts)
+            start = time.perf_counter()
+            strategy(engine, set_id)
+            results[name] = (time.perf_counter() - start) * 1000
+
+            with engine.connect() as conn:
+                leftover = conn.scalar(select(func.count()).select_from(PerformanceRecord))
+            print(f"{name:<24}{results[name]:>10.1f} ms  (performance records left: {leftover})")
+
+        orm_ms, sql_ms = results.values()
+        print(f"\nSet with {args.cards} cards and {args.attempts} attempts: "
+              f"SQL cascade is {orm_ms / sql_ms:.1f}x faster")
+        engine.dispose()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Training throughput benchmark for finetune.py profiles
+
+Runs a fixed number of optimizer steps for every (profile, thread count)
+combination, each in a fresh process so thread pools and peak memory do not
+leak between runs, and prints samples/sec and peak resident memory.
+
+Usage (from backend/):
+    python -m benchmarks.finetune_benchmark --steps 50 --threads 4 8
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def peak_memory_mb():
+    """Peak resident set size of the current process in MB, if available"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def run_config(profile, threads, steps, queue):
+    import finetune
+
+    finetune.configure_threads(threads)
+    with tempfile.TemporaryDirectory() as output_dir:
+        # Enough samples for `steps` batches of 16
+        trainer, _ = finetune.build_trainer(profile, output_dir=output_dir,
+                                            max_steps=steps, train_samples=steps * 16)
+        start = time.perf_counter()
+        metrics = trainer.train().metrics
+        elapsed = time.perf_counter() - start
+
+    queue.put({
+        'profile': profile,
+        'threads': threads or 'default',
+        'steps': steps,
+        'seconds': round(elapsed, 1),
+        'samples_per_sec': round(metrics.get('train_samples_per_second', 0), 2),
+        'peak_memory_mb': peak_memory_mb(),
+        'bf16': trainer.args.bf16
+    })
+
+def main():
+    import finetune
+
+    parser = argparse.ArgumentParser(description="Benchmark finetune.py training profiles")
+    parser.add_argument('--steps', type=int, default=50, help="Optimizer steps per configuration")
+    parser.add_argument('--profiles', nargs='+', default=sorted(finetune.PROFILES))
+    parser.add_argument('--threads', nargs='+', type=int, default=[0], help="Thread counts to try (0 = torch default)")
+    parser.add_argument('--json-out', help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for profile in args.profiles:
+        for threads in args.threads:
+            queue = context.Queue()
+            process = context.Process(target=run_config, args=(profile, threads or None, args.steps, queue))
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                print(f"{profile} (threads={threads or 'default'}) failed with exit code {process.exitcode}")
+                continue
+            result = queue.get()
+            results.append(result)
+            print(json.dumps(result))
+
+    print(f"\n{'profile':<14}{'threads':>9}{'bf16':>7}{'samples/s':>12}{'peak MB':>10}")
+    for r in sorted(results, key=lambda r: r['samples_per_sec'], reverse=True):
+        print(f"{r['profile']:<14}{str(r['threads']):>9}{str(r['bf16']):>7}"
+              f"{r['samples_per_sec']:>12.2f}{str(r['peak_memory_mb']):>10}")
+
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Related cards index benchmark
+
+Indexes synthetic flashcards with the TF-IDF index, writes it to disk and
+reports build time, on-disk size, memory-mapped load time, top-k query
+latency and the cost of incrementally adding cards afterwards.
+
+Usage (from backend/):
+    python -m benchmarks.related_benchmark --cards 100000
+"""
+
+import argparse
+import itertools
+import os
+import random
+import tempfile
+import time
+
+from related_index import RelatedCardsIndex
+
+def synthetic_cards(rng, count, start_id=1, vocabulary_size=20000):
+    # Zipf-like word frequencies so document frequencies resemble real text
+    words = [f"w{i}" for i in range(vocabulary_size)]
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(vocabulary_size)))
+    for card_id in range(start_id, start_id + count):
+        term = ' '.join(rng.choices(words, cum_weights=cum_weights, k=2))
+        context = ' '.join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(15, 40)))
+        yield card_id, term, context
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the related cards TF-IDF index")
+    parser.add_argument('--cards', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--additions', type=int, default=500, help="Cards added after the index is on disk")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        index = RelatedCardsIndex(tmpdir)
+        start = time.perf_counter()
+        index.add(synthetic_cards(rng, args.cards))
+        index.save()
+        print(f"Build + save:      {time.perf_counter() - start:8.2f} s for {args.cards} cards "
+              f"({directory_size(tmpdir) / 1048576:.1f} MB on disk)")
+
+        start = time.perf_counter()
+        index = RelatedCardsIndex(tmpdir)
+        print(f"Load (mmap):       {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+        timings = []
+        for _ in range(args.queries):
+            card_id = rng.randint(1, args.cards)
+            start = time.perf_counter()
+            index.related([card_id], args.k)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        print(f"Top-{args.k} query:      {timings[len(timings) // 2]:8.2f} ms p50, "
+              f"{timings[int(len(timings) * 0.95)]:.2f} ms p95 (first includes IDF/norm setup)")
+
+        start = time.perf_counter()
+        for card in synthetic_cards(rng, args.additions, start_id=args.cards + 1):
+            index.add([card])
+        elapsed = time.perf_counter() - start
+        print(f"Incremental add:   {elapsed / args.additions * 1000:8.3f} ms per card")
+
+        start = time.perf_counter()
+        index.related([args.cards + 1], args.k)
+        print(f"Query after adds:  {(time.perf_counter() - start) * 1000:8.2f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Serialization and compression benchmark for large API payloads
+
+Builds payloads shaped like get_flashcard_set and get_analysis responses and
+compares stdlib json vs. orjson encode time, plus raw, gzip and brotli sizes.
+
+Usage (from backend/):
+    python -m benchmarks.response_benchmark --cards 5000
+"""
+
+import argparse
+import gzip
+import json
+import random
+import time
+
+from response_encoding import orjson, brotli, GZIP_LEVEL, BROTLI_QUALITY
+
+WORDS = ('neural network gradient descent entropy photosynthesis mitochondria treaty empire '
+         'algorithm recursion polymer catalyst equilibrium inflation protein enzyme genome').split()
+
+def sentence(rng, n):
+    return ' '.join(rng.choice(WORDS) for _ in range(n)).capitalize() + '.'
+
+def flashcard_set_payload(cards, rng):
+    return {
+        'id': 1,
+        'title': 'Benchmark Set',
+        'created_at': '2024-01-01T00:00:00',
+        'flashcards': [{
+            'id': i,
+            'term': f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}",
+            'question': f"What is term {i}?",
+            'answer': sentence(rng, 15),
+            'context': sentence(rng, 35),
+            'difficulty_level': rng.choice(['easy', 'medium', 'hard'])
+        } for i in range(cards)],
+        'count': cards
+    }
+
+def analysis_payload(cards, rng):
+    return {
+        'total_attempts': cards * 5,
+        'accuracy': 71.3,
+        'term_analysis': {
+            f"term {i}": {'correct': rng.randint(0, 9), 'incorrect': rng.randint(0, 9), 'total': 9,
+                          'accuracy': rng.random() * 100, 'flashcard_id': i}
+            for i in range(cards)
+        }
+    }
+
+def timed(fn, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON encoding and response compression")
+    parser.add_argument('--cards', type=int, default=5000)
+    parser.add_argument('--repeats', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    payloads = {
+        'get_flashcard_set': flashcard_set_payload(args.cards, rng),
+        'get_analysis': analysis_payload(args.cards, rng),
+    }
+
+    for name, payload in payloads.items():
+        # Flask's default provider sorts keys and emits a str that is then encoded
+        body, stdlib_ms = timed(lambda: json.dumps(payload, sort_keys=True).encode('utf-8'), args.repeats)
+        print(f"\n{name} ({args.cards} cards)")
+        print(f"  stdlib json:  {stdlib_ms:8.2f} ms")
+        if orjson:
+            body, orjson_ms = timed(lambda: orjson.dumps(payload), args.repeats)
+            print(f"  orjson:       {orjson_ms:8.2f} ms  ({stdlib_ms / orjson_ms:.1f}x faster)")
+        else:
+            print("  orjson:       not installed")
+
+        print(f"  raw:          {len(body) / 1024:8.1f} KB")
+        gz, gzip_ms = timed(lambda: gzip.compress(body, compresslevel=GZIP_LEVEL), args.repeats)
+        print(f"  gzip:         {len(gz) / 1024:8.1f} KB  ({len(gz) / len(body):.1%}, {gzip_ms:.2f} ms)")
+        if brotli:
+            br, brotli_ms = timed(lambda: brotli.compress(body, quality=BROTLI_QUALITY), args.repeats)
+            print(f"  brotli:       {len(br) / 1024:8.1f} KB  ({len(br) / len(body):.1%}, {brotli_ms:.2f} ms)")
+        else:
+            print("  brotli:       not installed")
+
+if __name__ == '__main__':
+    main()
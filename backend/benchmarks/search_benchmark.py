@@ -0,0 +1,161 @@
+"""
+Search latency benchmark for the flashcard FTS5 index
+
+Builds a throwaway SQLite database with synthetic flashcards drawn from a
+Zipf-distributed vocabulary, indexes it through the same triggers the app
+uses and reports query latency for words of decreasing frequency, next to
+a LIKE scan that does the same work (every row checked, matches ordered
+by whether the term matched, then paginated).
+
+Usage (from backend/):
+    python -m benchmarks.search_benchmark --cards 1000000
+"""
+
+import argparse
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+from sqlalchemy import create_engine, text as sql_text
+
+from search_index import create_search_index, rebuild_search_index, search_flashcards, build_fts_query, FTS_TABLE
+
+VOCABULARY_SIZE = 50000
+SYLLABLES = [consonant + vowel for consonant in 'bdfgklmnprstvz' for vowel in 'aeiou']
+
+def make_vocabulary(size):
+    """Distinct pronounceable words; rank 0 is the most frequent"""
+    words = []
+    for length in itertools.count(2):
+        for combination in itertools.product(SYLLABLES, repeat=length):
+            words.append(''.join(combination))
+            if len(words) == size:
+                return words
+
+VOCABULARY = make_vocabulary(VOCABULARY_SIZE)
+CUM_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(VOCABULARY_SIZE)))
+
+# Queries from very common to rare words, a two-word query and a prefix
+QUERIES = [
+    ('rank 1', VOCABULARY[0]),
+    ('rank 10', VOCABULARY[9]),
+    ('rank 100', VOCABULARY[99]),
+    ('rank 1000', VOCABULARY[999]),
+    ('rank 10000', VOCABULARY[9999]),
+    ('rank 5 + rank 500', f"{VOCABULARY[4]} {VOCABULARY[499]}"),
+    ('prefix of rank 50', VOCABULARY[49][:4]),
+]
+
+def random_words(rng, count):
+    return ' '.join(rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=count))
+
+def random_sentence(rng, words):
+    return random_words(rng, words).capitalize() + '.'
+
+def populate(engine, card_count, batch_size=10000, with_triggers=True):
+    """Insert synthetic flashcards in batches"""
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        conn.execute(sql_text("CREATE TABLE flashcard_set (id INTEGER PRIMARY KEY, title VARCHAR(200) NOT NULL, created_at DATETIME)"))
+        conn.execute(sql_text("""
+            CREATE TABLE flashcard (
+                id INTEGER PRIMARY KEY, term VARCHAR(200) NOT NULL, question TEXT NOT NULL,
+                answer TEXT NOT NULL, context TEXT, difficulty_level VARCHAR(20), set_id INTEGER NOT NULL
+            )
+        """))
+        conn.execute(sql_text("INSERT INTO flashcard_set (id, title) VALUES (1, 'Benchmark Set')"))
+        if with_triggers:
+            create_search_index(conn)
+
+    start = time.perf_counter()
+    for offset in range(0, card_count, batch_size):
+        rows = []
+        for _ in range(min(batch_size, card_count - offset)):
+            term = random_words(rng, 2)
+            rows.append({
+                'term': term,
+                'question': f"What is {term}?",
+                'answer': random_sentence(rng, 12),
+                'context': random_sentence(rng, 30),
+                'difficulty_level': 'medium',
+                'set_id': 1
+            })
+        with engine.begin() as conn:
+            conn.execute(sql_text("""
+                INSERT INTO flashcard (term, question, answer, context, difficulty_level, set_id)
+                VALUES (:term, :question, :answer, :context, :difficulty_level, :set_id)
+            """), rows)
+    return time.perf_counter() - start
+
+def like_search(conn, query, page=1, per_page=20):
+    """
+    The LIKE scan the index replaces, doing comparable work: every word must
+    appear somewhere in the card, term matches rank first, and the whole
+    table is scanned before a page can be cut
+    """
+    words = query.split()
+    document = "(term || ' ' || question || ' ' || answer || ' ' || COALESCE(context, ''))"
+    params = {f'w{i}': f'%{word}%' for i, word in enumerate(words)}
+    conditions = ' AND '.join(f"{document} LIKE :{name}" for name in params)
+    term_matches = ' + '.join(f"(term LIKE :{name})" for name in params)
+    return conn.execute(sql_text(f"""
+        SELECT id FROM flashcard WHERE {conditions}
+        ORDER BY {term_matches} DESC, id
+        LIMIT :limit OFFSET :offset
+    """), {**params, 'limit': per_page + 1, 'offset': (page - 1) * per_page}).all()
+
+def match_count(conn, query):
+    return conn.execute(sql_text(f"SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"),
+                        {'match': build_fts_query(query)}).scalar()
+
+def percentiles(run, repeats):
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {'p50': statistics.median(latencies), 'p95': latencies[max(int(len(latencies) * 0.95) - 1, 0)]}
+
+def time_queries(engine, repeats, baseline_repeats):
+    """Time each query and page with the FTS index and with the LIKE baseline (ms)"""
+    report = []
+    with engine.connect() as conn:
+        for label, query in QUERIES:
+            matches = match_count(conn, query)
+            for page in (1, 10):
+                fts = percentiles(lambda: search_flashcards(conn, query, page=page, per_page=20), repeats)
+                like = percentiles(lambda: like_search(conn, query, page=page), baseline_repeats)
+                report.append((label, matches, page, fts, like))
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark flashcard full-text search")
+    parser.add_argument('--cards', type=int, default=1000000, help="Number of synthetic flashcards")
+    parser.add_argument('--repeats', type=int, default=20, help="Runs per FTS query")
+    parser.add_argument('--baseline-repeats', type=int, default=3, help="Runs per LIKE query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # Trigger-maintained index (the online insert path)
+        engine = create_engine(f"sqlite:///{os.path.join(tmpdir, 'search_bench.db')}")
+        insert_seconds = populate(engine, args.cards)
+        print(f"Inserted {args.cards} cards with sync triggers in {insert_seconds:.1f}s "
+              f"({args.cards / insert_seconds:,.0f} cards/s)")
+
+        # Offline rebuild of the same data
+        start = time.perf_counter()
+        with engine.begin() as conn:
+            rebuild_search_index(conn)
+        print(f"Rebuilt index over {args.cards} cards in {time.perf_counter() - start:.1f}s")
+
+        print(f"\n{'query':<20}{'matches':>10}{'page':>6}{'FTS p50':>10}{'FTS p95':>10}{'LIKE p50':>11}{'LIKE p95':>11}")
+        for label, matches, page, fts, like in time_queries(engine, args.repeats, args.baseline_repeats):
+            print(f"{label:<20}{matches:>10}{page:>6}{fts['p50']:>10.2f}{fts['p95']:>10.2f}"
+                  f"{like['p50']:>11.2f}{like['p95']:>11.2f}")
+        engine.dispose()
+
+if __name__ == '__main__':
+    main()
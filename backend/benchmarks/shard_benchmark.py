@@ -0,0 +1,94 @@
+"""
+Sharded performance storage benchmark: answer write throughput vs. shard count
+
+Several worker processes record answers for random users at once, each
+answer going through the same path as record_performance: the flashcard
+lookup and resolve_user_key on the primary database, then the performance
+record, review schedule and daily rollup on the session ShardRouter picks,
+committed together. Every shard count gets a fresh database in a temporary
+directory (UKNOW_DATABASE_URI / UKNOW_PERFORMANCE_SHARDS are set before the
+workers import the app). User rows are created up front and every worker
+warms its user key cache before the clock starts, so the timed loop is the
+steady-state write path: only the shard commits need a write lock.
+
+Usage (from backend/):
+    python -m benchmarks.shard_benchmark --shards 1 2 4 8 --workers 8 --answers 2000
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from sqlalchemy import insert
+
+def prepare_database(sets, cards_per_set, users):
+    """Create the schema (and shard files), the users and the flashcards answers refer to"""
+    from app import app, db, migrate_database, FlashcardSet, Flashcard, User
+    with app.app_context():
+        db.create_all()
+        migrate_database()
+        db.session.execute(insert(User), [{'external_id': f"user-{i}"} for i in range(users)])
+        for index in range(sets):
+            flashcard_set = FlashcardSet(title=f"Benchmark set {index}")
+            db.session.add(flashcard_set)
+            db.session.flush()
+            db.session.add_all([Flashcard(set_id=flashcard_set.id, term=f"term {index}-{i}",
+                                          question='question', answer='answer')
+                                for i in range(cards_per_set)])
+        db.session.commit()
+        return [card_id for (card_id,) in db.session.query(Flashcard.id)]
+
+def run_worker(job):
+    from app import (app, db, performance_router, resolve_user_key, update_card_schedule,
+                     increment_daily_performance, Flashcard, PerformanceRecord)
+    worker, answers, users, card_ids = job
+    rng = random.Random(worker)
+    with app.app_context():
+        for index in range(users):
+            resolve_user_key(f"user-{index}", create=False)
+        started = time.time()
+        for _ in range(answers):
+            user_id = f"user-{rng.randrange(users)}"
+            status = 'correct' if rng.random() < 0.7 else 'incorrect'
+            flashcard = db.session.get(Flashcard, rng.choice(card_ids))
+
+            session = performance_router.session_for(user_id)
+            session.add(PerformanceRecord(flashcard_id=flashcard.id, user_id=resolve_user_key(user_id), status=status))
+            update_card_schedule(session, flashcard, user_id, status)
+            increment_daily_performance(session, user_id, flashcard.set_id, status)
+            session.commit()
+            db.session.close()  # Ends the primary read transaction, as the end of a request would
+        finished = time.time()
+    return started, finished
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark answer write throughput across shard counts")
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent writer processes")
+    parser.add_argument('--answers', type=int, default=2000, help="Answers recorded per worker")
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--sets', type=int, default=50)
+    parser.add_argument('--cards-per-set', type=int, default=100)
+    args = parser.parse_args()
+
+    # Workers must import the app after the environment points it at the benchmark database
+    context = multiprocessing.get_context('spawn')
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for shard_count in args.shards:
+            os.environ['UKNOW_DATABASE_URI'] = f"sqlite:///{os.path.join(tmpdir, f'bench-{shard_count}.db')}"
+            os.environ['UKNOW_PERFORMANCE_SHARDS'] = str(shard_count)
+            with context.Pool(args.workers) as pool:
+                card_ids = pool.apply(prepare_database, (args.sets, args.cards_per_set, args.users))
+                jobs = [(worker, args.answers, args.users, card_ids) for worker in range(args.workers)]
+                spans = pool.map(run_worker, jobs)
+            elapsed = max(end for _, end in spans) - min(start for start, _ in spans)
+            throughput = args.workers * args.answers / elapsed
+            baseline = baseline or throughput
+            print(f"{shard_count:>2} shard(s): {throughput:9.0f} answers/s "
+                  f"({throughput / baseline:.2f}x, {elapsed:.1f}s for {args.workers * args.answers} answers)")
+
+if __name__ == '__main__':
+    main()
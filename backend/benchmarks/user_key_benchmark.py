@@ -0,0 +1,147 @@
+"""
+Performance record storage benchmark: string user ids vs. integer user keys
+
+Builds the same attempt history twice in throwaway SQLite files: once with
+the old schema (user_id VARCHAR on every row) and once with user_id as an
+integer key into the user table. Reports table and index sizes (from the
+dbstat virtual table) and get_analysis-style query latency for both.
+
+Usage (from backend/):
+    python -m benchmarks.user_key_benchmark --attempts 1000000 --users 5000
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import string
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+COMMON_DDL = """
+    CREATE TABLE flashcard (id INTEGER PRIMARY KEY, term VARCHAR(200) NOT NULL, set_id INTEGER NOT NULL);
+    CREATE INDEX ix_flashcard_set_id ON flashcard (set_id);
+"""
+
+STRING_KEY_DDL = COMMON_DDL + """
+    CREATE TABLE performance_record (
+        id INTEGER PRIMARY KEY,
+        flashcard_id INTEGER NOT NULL REFERENCES flashcard (id) ON DELETE CASCADE,
+        user_id VARCHAR(100) NOT NULL,
+        status VARCHAR(20) NOT NULL,
+        timestamp DATETIME
+    );
+    CREATE INDEX ix_performance_record_flashcard_id ON performance_record (flashcard_id);
+    CREATE INDEX ix_performance_record_user_id ON performance_record (user_id);
+"""
+
+INTEGER_KEY_DDL = COMMON_DDL + """
+    CREATE TABLE user (id INTEGER PRIMARY KEY, external_id VARCHAR(100) NOT NULL UNIQUE, created_at DATETIME);
+    CREATE TABLE performance_record (
+        id INTEGER PRIMARY KEY,
+        flashcard_id INTEGER NOT NULL REFERENCES flashcard (id) ON DELETE CASCADE,
+        user_id INTEGER NOT NULL REFERENCES user (id) ON DELETE CASCADE,
+        status VARCHAR(20) NOT NULL,
+        timestamp DATETIME
+    );
+    CREATE INDEX ix_performance_record_flashcard_id ON performance_record (flashcard_id);
+    CREATE INDEX ix_performance_record_user_id ON performance_record (user_id);
+"""
+
+# What get_analysis reads: one user's attempts, optionally limited to a set
+STRING_KEY_QUERY = """
+    SELECT r.flashcard_id, r.status FROM performance_record r
+    WHERE r.user_id = ? AND r.flashcard_id IN (SELECT id FROM flashcard WHERE set_id = ?)
+"""
+INTEGER_KEY_QUERY = """
+    SELECT r.flashcard_id, r.status FROM performance_record r
+    WHERE r.user_id = (SELECT id FROM user WHERE external_id = ?)
+      AND r.flashcard_id IN (SELECT id FROM flashcard WHERE set_id = ?)
+"""
+
+def session_id(rng):
+    """Ids shaped like the frontend's localStorage ids ('user_' + 9 base36 chars)"""
+    return 'user_' + ''.join(rng.choice(string.ascii_lowercase + string.digits) for _ in range(9))
+
+def build(path, ddl, integer_keys, args):
+    rng = random.Random(42)
+    users = [session_id(rng) for _ in range(args.users)]
+    conn = sqlite3.connect(path)
+    conn.executescript(ddl)
+    conn.executemany("INSERT INTO flashcard (id, term, set_id) VALUES (?, ?, ?)",
+                     [(i, f'term {i}', i % args.sets + 1) for i in range(1, args.cards + 1)])
+    if integer_keys:
+        conn.executemany("INSERT INTO user (id, external_id) VALUES (?, ?)",
+                         [(i, user) for i, user in enumerate(users, start=1)])
+
+    start = datetime(2024, 1, 1)
+    for offset in range(0, args.attempts, 50000):
+        rows = []
+        for _ in range(min(50000, args.attempts - offset)):
+            user = rng.randrange(args.users)
+            rows.append((rng.randint(1, args.cards), user + 1 if integer_keys else users[user],
+                         rng.choice(('correct', 'incorrect')),
+                         (start + timedelta(minutes=rng.randint(0, 525600))).isoformat(' ')))
+        conn.executemany("INSERT INTO performance_record (flashcard_id, user_id, status, timestamp) "
+                         "VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.execute("ANALYZE")
+    return conn, users
+
+def object_sizes(conn):
+    """Bytes used per table/index, or None when SQLite lacks the dbstat table"""
+    try:
+        return dict(conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").fetchall())
+    except sqlite3.OperationalError:
+        return None
+
+def query_latency(conn, query, users, args):
+    rng = random.Random(7)
+    timings = []
+    for _ in range(args.queries):
+        params = (rng.choice(users), rng.randint(1, args.sets))
+        start = time.perf_counter()
+        conn.execute(query, params).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.95)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark string vs. integer user keys on performance records")
+    parser.add_argument('--attempts', type=int, default=1000000, help="Performance records to insert")
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--cards', type=int, default=20000)
+    parser.add_argument('--sets', type=int, default=200)
+    parser.add_argument('--queries', type=int, default=2000, help="Analytics queries to time")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        results = {}
+        for name, ddl, query, integer_keys in (
+                ('string user_id', STRING_KEY_DDL, STRING_KEY_QUERY, False),
+                ('integer user key', INTEGER_KEY_DDL, INTEGER_KEY_QUERY, True)):
+            path = os.path.join(tmpdir, f"{'int' if integer_keys else 'str'}.db")
+            conn, users = build(path, ddl, integer_keys, args)
+            sizes = object_sizes(conn)
+            p50, p95 = query_latency(conn, query, users, args)
+            conn.close()
+            results[name] = (os.path.getsize(path), sizes, p50, p95)
+
+        print(f"{args.attempts} attempts, {args.users} users\n")
+        for name, (file_size, sizes, p50, p95) in results.items():
+            print(name)
+            print(f"  database file:          {file_size / 1048576:8.1f} MB")
+            if sizes is None:
+                print("  table/index sizes:      dbstat not available in this SQLite build")
+            else:
+                print(f"  performance_record:     {sizes['performance_record'] / 1048576:8.1f} MB")
+                print(f"  user_id index:          {sizes['ix_performance_record_user_id'] / 1048576:8.1f} MB")
+                if 'user' in sizes:
+                    user_bytes = sizes['user'] + sizes.get('sqlite_autoindex_user_1', 0)
+                    print(f"  user table + index:     {user_bytes / 1048576:8.1f} MB")
+            print(f"  analysis query p50/p95: {p50:8.3f} / {p95:.3f} ms\n")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Offline bulk importer for directories of PDFs
+
+Extracts text and generates flashcards with the same pipeline as
+/api/upload_and_generate, spread across a process pool. Files are identified
+by content hash, so already-imported PDFs are skipped and an interrupted run
+can simply be started again.
+
+Usage (from backend/):
+    python bulk_import.py path/to/pdfs --workers 8 --recursive
+"""
+
+import argparse
+import hashlib
+import multiprocessing
+import os
+import time
+from sqlalchemy import insert
+
+from app import (app, db, FlashcardSet, Flashcard, ImportedDocument, migrate_database,
+                 extract_text_from_pdf, generate_flashcards_for_text, DEFAULT_CARDS_PER_SET, MAX_CARDS_PER_SET)
+
+def find_pdfs(directory, recursive=False):
+    if recursive:
+        for root, _, files in os.walk(directory):
+            for name in sorted(files):
+                if name.lower().endswith('.pdf'):
+                    yield os.path.join(root, name)
+    else:
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if name.lower().endswith('.pdf') and os.path.isfile(path):
+                yield path
+
+def file_hash(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def process_pdf(job):
+    """Worker: extract text and generate cards for one PDF (no database access)"""
+    path, content_hash, limit = job
+    started = time.perf_counter()
+    try:
+        text = extract_text_from_pdf(path)
+        cards = []
+        collapsed = 0
+        if text and len(text.strip()) >= 50:
+            cards, stats = generate_flashcards_for_text(text, limit)
+            collapsed = stats['collapsed_count']
+        return {
+            'path': path,
+            'hash': content_hash,
+            'title': os.path.splitext(os.path.basename(path))[0],
+            'cards': cards,
+            'collapsed': collapsed,
+            'seconds': time.perf_counter() - started,
+            'error': None
+        }
+    except Exception as e:
+        return {'path': path, 'hash': content_hash, 'cards': [], 'error': str(e)}
+
+def write_batch(results):
+    """Write the sets, cards and import records of several files in one transaction"""
+    for result in results:
+        set_id = None
+        if result['cards']:
+            flashcard_set = FlashcardSet(title=result['title'][:200])
+            db.session.add(flashcard_set)
+            db.session.flush()
+            set_id = flashcard_set.id
+            rows = [{k: v for k, v in card.items() if k != 'score'} for card in result['cards']]
+            for row in rows:
+                row['set_id'] = set_id
+            db.session.execute(insert(Flashcard), rows)
+
+        db.session.add(ImportedDocument(
+            content_hash=result['hash'],
+            filename=result['path'][-500:],
+            status='imported' if set_id else 'empty',
+            set_id=set_id,
+            card_count=len(result['cards'])
+        ))
+    # Import records commit together with their sets, so a crash never leaves a half-imported file
+    db.session.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-import a directory of PDFs as flashcard sets")
+    parser.add_argument('directory')
+    parser.add_argument('--recursive', action='store_true', help="Include subdirectories")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="Extraction processes")
+    parser.add_argument('--limit', type=int, default=DEFAULT_CARDS_PER_SET, help="Cards per set")
+    parser.add_argument('--batch-size', type=int, default=50, help="Files per database transaction")
+    parser.add_argument('--report-every', type=float, default=5.0, help="Seconds between progress lines")
+    args = parser.parse_args()
+    limit = max(1, min(args.limit, MAX_CARDS_PER_SET))
+
+    with app.app_context():
+        db.create_all()
+        migrate_database()
+
+        started = time.perf_counter()
+        known_hashes = {h for (h,) in db.session.query(ImportedDocument.content_hash)}
+
+        jobs = []
+        skipped = 0
+        for path in find_pdfs(args.directory, args.recursive):
+            content_hash = file_hash(path)
+            if content_hash in known_hashes:
+                skipped += 1
+                continue
+            known_hashes.add(content_hash)  # Identical copies within this run
+            jobs.append((path, content_hash, limit))
+
+        print(f"Found {len(jobs) + skipped} PDFs: {skipped} already imported, {len(jobs)} to process")
+        if not jobs:
+            return
+
+        imported = empty = failed = cards = collapsed = 0
+        pending = []
+        last_report = time.perf_counter()
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(processes=args.workers) as pool:
+            for done, result in enumerate(pool.imap_unordered(process_pdf, jobs), start=1):
+                if result['error']:
+                    failed += 1
+                    print(f"Failed: {result['path']}: {result['error']}")
+                else:
+                    pending.append(result)
+                    cards += len(result['cards'])
+                    collapsed += result['collapsed']
+                    if result['cards']:
+                        imported += 1
+                    else:
+                        empty += 1
+
+                if len(pending) >= args.batch_size:
+                    write_batch(pending)
+                    pending = []
+
+                now = time.perf_counter()
+                if now - last_report >= args.report_every:
+                    elapsed = now - started
+                    rate = done / elapsed
+                    eta = (len(jobs) - done) / rate if rate else 0
+                    print(f"[{done}/{len(jobs)}] {rate:.2f} files/s, {cards / elapsed:.1f} cards/s, "
+                          f"ETA {eta / 60:.1f} min")
+                    last_report = now
+
+        if pending:
+            write_batch(pending)
+
+        elapsed = time.perf_counter() - started
+        print(f"\nDone in {elapsed:.1f}s: {imported} sets imported, {empty} without usable text, "
+              f"{failed} failed, {skipped} skipped")
+        print(f"Throughput: {len(jobs) / elapsed:.2f} files/s, {cards / elapsed:.1f} cards/s ({cards} cards)")
+        print(f"Near-duplicate candidates collapsed before generation: {collapsed}")
+        if failed:
+            print("Failed files are not recorded and will be retried on the next run")
+
+if __name__ == '__main__':
+    main()
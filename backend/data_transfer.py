@@ -0,0 +1,56 @@
+"""
+Streaming NDJSON helpers for UKnow export/import
+Encodes records as gzip-compressed NDJSON chunks and decodes plain or gzip
+NDJSON streams line by line, so memory stays constant regardless of size
+"""
+
+import gzip
+import io
+import json
+import zlib
+
+GZIP_MAGIC = b'\x1f\x8b'
+EXPORT_FORMAT = 'uknow-export'
+EXPORT_VERSION = 2  # 2 adds 'schedule' records
+
+def gzip_ndjson_stream(records, flush_bytes=64 * 1024, level=6):
+    """
+    Encode an iterable of dicts as gzip-compressed NDJSON
+
+    Yields compressed byte chunks as soon as roughly flush_bytes of JSON has
+    been buffered; suitable for a streaming HTTP response or a file.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+    buffer = []
+    buffered = 0
+    for record in records:
+        line = json.dumps(record, separators=(',', ':'), default=str) + '\n'
+        buffer.append(line)
+        buffered += len(line)
+        if buffered >= flush_bytes:
+            chunk = compressor.compress(''.join(buffer).encode('utf-8'))
+            buffer = []
+            buffered = 0
+            if chunk:
+                yield chunk
+    yield compressor.compress(''.join(buffer).encode('utf-8')) + compressor.flush()
+
+def read_ndjson(stream):
+    """
+    Iterate (line_number, record) pairs of an NDJSON byte stream, gzip-compressed or not
+
+    Args:
+        stream: Binary file-like object (request stream, open file)
+    """
+    reader = io.BufferedReader(stream) if not hasattr(stream, 'peek') else stream
+    if reader.peek(2)[:2] == GZIP_MAGIC:
+        reader = gzip.GzipFile(fileobj=reader, mode='rb')
+    for line_number, line in enumerate(io.TextIOWrapper(reader, encoding='utf-8'), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_number}: {e}")
+        yield line_number, record
@@ -1,10 +1,14 @@
 """
 Multi-Model Enhancement Module for UKnow
-Implements AI-Powered Summarization and Neural Machine Translation
+Implements AI-Powered Summarization, Neural Machine Translation and
+batched difficulty classification with a fine-tuned model
 """
 
 import os
-import re
+import queue
+import threading
+import time
+from concurrent.futures import Future, wait
 import nltk
 from sumy.parsers.plaintext import PlaintextParser
 from sumy.nlp.tokenizers import Tokenizer
@@ -13,18 +17,146 @@ from sumy.summarizers.lsa import LsaSummarizer
 from sumy.summarizers.text_rank import TextRankSummarizer
 from deep_translator import GoogleTranslator
 import logging
+from text_analysis import AnalyzedDocument, analyze_document
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Optional fine-tuned difficulty classifier (falls back to the heuristic if unset)
+DIFFICULTY_MODEL_PATH = os.environ.get('UKNOW_DIFFICULTY_MODEL')
+DIFFICULTY_LEVELS = ['easy', 'medium', 'hard']
+
+class BatchedTextClassifier:
+    """
+    In-process sequence classifier that serves a saved checkpoint
+
+    The model is loaded once and, on CPU, dynamically quantized to int8.
+    Concurrent classify() calls are gathered by a single worker thread into
+    micro-batches of up to max_batch_size, waiting at most max_wait_ms after
+    the first request before running the batch. classify_many() queues a
+    caller's texts together, so they fill whole batches without waiting.
+    Requests whose caller gave up are cancelled and skipped by the worker.
+    """
+    
+    def __init__(self, model_path, labels=None, quantize=True, max_batch_size=16,
+                 max_wait_ms=10, max_length=256):
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+        
+        self.torch = torch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_length = max_length
+        
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        model = AutoModelForSequenceClassification.from_pretrained(model_path)
+        model.eval()
+        if quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+        self.labels = labels or [model.config.id2label[i] for i in range(model.config.num_labels)]
+        
+        self._requests = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name='difficulty-classifier', daemon=True)
+        self._worker.start()
+        logger.info(f"Loaded classifier from {model_path} (quantized={quantize}, labels={self.labels})")
+    
+    def predict(self, texts):
+        """Classify a list of texts in one forward pass; returns (label, confidence) pairs"""
+        inputs = self.tokenizer(texts, padding=True, truncation=True,
+                                max_length=self.max_length, return_tensors='pt')
+        with self.torch.inference_mode():
+            probabilities = self.torch.softmax(self.model(**inputs).logits, dim=-1)
+        confidences, indices = probabilities.max(dim=-1)
+        return [(self.labels[i], round(c, 4)) for i, c in zip(indices.tolist(), confidences.tolist())]
+    
+    def classify(self, text, timeout=None):
+        """Queue a single text for the next micro-batch and wait for its result"""
+        return self.classify_many([text], timeout=timeout)[0]
+    
+    def classify_many(self, texts, timeout=None):
+        """
+        Queue several texts at once and wait for all results, in order
+
+        timeout bounds the whole call. When it expires, requests the worker
+        has not started are cancelled, so they do not take batch slots, and
+        TimeoutError is raised.
+        """
+        futures = []
+        for text in texts:
+            future = Future()
+            self._requests.put((text, future))
+            futures.append(future)
+        _, pending = wait(futures, timeout=timeout)
+        if pending:
+            for future in pending:
+                future.cancel()
+            raise TimeoutError(f"{len(pending)} of {len(futures)} texts not classified within {timeout}s")
+        return [future.result() for future in futures]
+    
+    def _next_request(self, timeout=None):
+        """Next request still wanted by its caller (marked running), or None when the wait times out"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            try:
+                text, future = self._requests.get(timeout=remaining)
+            except queue.Empty:
+                return None
+            if future.set_running_or_notify_cancel():
+                return text, future
+    
+    def _run(self):
+        while True:
+            batch = [self._next_request()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                request = self._next_request(deadline - time.monotonic())
+                if request is None:
+                    break
+                batch.append(request)
+            
+            texts = [text for text, _ in batch]
+            try:
+                results = self.predict(texts)
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+def difficulty_labels_for(model_path):
+    """
+    Map a checkpoint's classes to difficulty levels
+
+    Accepts checkpoints whose id2label names are easy/medium/hard, or generic
+    three-class checkpoints (LABEL_0..2), read as ordinal easy < medium < hard.
+    Returns None for anything else, e.g. the binary IMDB sentiment models.
+    """
+    from transformers import AutoConfig
+    
+    config = AutoConfig.from_pretrained(model_path)
+    names = [str(config.id2label[i]).lower() for i in range(config.num_labels)]
+    if sorted(names) == sorted(DIFFICULTY_LEVELS):
+        return names
+    if config.num_labels == len(DIFFICULTY_LEVELS):
+        return list(DIFFICULTY_LEVELS)
+    return None
+
 class DeepLearningService:
     """
     Multi-Model Enhancement Module for AI-powered features
     """
     
-    def __init__(self):
+    def __init__(self, difficulty_model_path=DIFFICULTY_MODEL_PATH):
         self.summarizer = None
+        self.difficulty_model_path = difficulty_model_path
+        self._difficulty_classifier = None
+        self._difficulty_classifier_failed = False
+        self._difficulty_lock = threading.Lock()
         self._initialize_nltk()
         
     def _initialize_nltk(self):
@@ -41,12 +173,55 @@ class DeepLearningService:
             logger.info("Downloading NLTK stopwords...")
             nltk.download('stopwords', quiet=True)
     
+    def _get_difficulty_classifier(self):
+        """Load the fine-tuned difficulty classifier once, on first use"""
+        if self._difficulty_classifier or self._difficulty_classifier_failed or not self.difficulty_model_path:
+            return self._difficulty_classifier
+        
+        with self._difficulty_lock:
+            if self._difficulty_classifier is None and not self._difficulty_classifier_failed:
+                try:
+                    labels = difficulty_labels_for(self.difficulty_model_path)
+                    if labels is None:
+                        raise ValueError("checkpoint labels are not difficulty levels")
+                    self._difficulty_classifier = BatchedTextClassifier(self.difficulty_model_path, labels=labels)
+                except Exception as e:
+                    logger.warning(f"Difficulty model unavailable, using heuristic: {e}")
+                    self._difficulty_classifier_failed = True
+        return self._difficulty_classifier
+    
+    def classify_difficulty(self, text, timeout=5):
+        """
+        Classify difficulty with the fine-tuned model
+        
+        Returns:
+            tuple: (difficulty_level, confidence), or None if no model is available
+        """
+        predictions = self.classify_difficulty_many([text], timeout=timeout)
+        return predictions[0] if predictions else None
+    
+    def classify_difficulty_many(self, texts, timeout=5):
+        """
+        Classify several texts with the fine-tuned model in shared micro-batches
+        
+        Returns:
+            list: (difficulty_level, confidence) per text, or None if no model is available
+        """
+        classifier = self._get_difficulty_classifier()
+        if classifier is None or not texts:
+            return None
+        try:
+            return classifier.classify_many(texts, timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Difficulty model inference failed, using heuristic: {e}")
+            return None
+    
     def summarize_text(self, text, sentence_count=3, method='lexrank'):
         """
         Extractive Text Summarization using multiple algorithms
         
         Args:
-            text (str): Input text to summarize
+            text (str | AnalyzedDocument): Input text to summarize
             sentence_count (int): Number of sentences in summary
             method (str): Summarization method ('lexrank', 'lsa', 'textrank')
             
@@ -54,11 +229,14 @@ class DeepLearningService:
             str: Summarized text
         """
         try:
-            if not text or len(text.strip()) < 50:
+            # Segment once; cleaning and the fallback summarizer share it
+            doc = text if isinstance(text, AnalyzedDocument) else AnalyzedDocument(text)
+            
+            if len(doc.text.strip()) < 50:
                 return "Text too short to summarize effectively."
             
             # Clean and prepare text
-            cleaned_text = self._clean_text_for_summary(text)
+            cleaned_text = self._clean_text_for_summary(doc)
             
             # Parse text
             parser = PlaintextParser.from_string(cleaned_text, Tokenizer("english"))
@@ -87,7 +265,7 @@ class DeepLearningService:
                         summarizer = TextRankSummarizer()
                     elif method_name == 'simple':
                         # Simple extractive summarization fallback
-                        return self._simple_extractive_summary(text, sentence_count)
+                        return self._simple_extractive_summary(doc, sentence_count)
                     
                     # Generate summary
                     summary_sentences = summarizer(parser.document, sentence_count)
@@ -110,12 +288,10 @@ class DeepLearningService:
     
     def _clean_text_for_summary(self, text):
         """Clean text for better summarization"""
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
+        doc = analyze_document(text)
         
-        # Remove very short sentences (likely artifacts)
-        sentences = text.split('.')
-        sentences = [s.strip() for s in sentences if len(s.strip()) > 10]
+        # Remove very short sentences (likely artifacts), with whitespace normalized
+        sentences = [s for s in doc.normalized_sentences if len(s) > 10]
         
         return '. '.join(sentences)
     
@@ -175,24 +351,8 @@ class DeepLearningService:
     
     def _extract_technical_terms(self, text):
         """Extract technical terms that should be preserved during translation"""
-        technical_patterns = [
-            r'\b[A-Z]{2,}\b',  # Acronyms (CNN, API, etc.)
-            r'\b\w*[A-Z]\w*[A-Z]\w*\b',  # CamelCase terms
-            r'\b\w+\([^)]*\)\b',  # Terms with parentheses
-            r'\b\d+\.\d+\b',  # Version numbers
-            r'\b[a-zA-Z]+\d+[a-zA-Z]*\b',  # Mixed alphanumeric (HTML5, etc.)
-        ]
-        
-        technical_terms = set()
-        for pattern in technical_patterns:
-            matches = re.findall(pattern, text)
-            technical_terms.update(matches)
-        
-        # Filter out common words
-        common_words = {'THE', 'AND', 'OR', 'BUT', 'IN', 'ON', 'AT', 'TO', 'FOR'}
-        technical_terms = [term for term in technical_terms if term.upper() not in common_words]
-        
-        return list(technical_terms)[:20]  # Limit to 20 terms
+        # Pattern matching and common-word filtering are cached on the shared document
+        return analyze_document(text).technical_terms[:20]  # Limit to 20 terms
     
     def _replace_technical_terms(self, text, technical_terms):
         """Replace technical terms with placeholders for translation"""
@@ -236,19 +396,45 @@ class DeepLearningService:
         Analyze text complexity for difficulty classification
         
         Args:
-            text (str): Text to analyze
+            text (str | AnalyzedDocument): Text to analyze
             
         Returns:
             dict: Complexity metrics
         """
+        return self.analyze_texts_complexity([text])[0]
+    
+    def analyze_texts_complexity(self, texts):
+        """
+        Analyze the complexity of several texts, sending all of them to the
+        difficulty model in one call so they share micro-batches
+        
+        Args:
+            texts (list): Texts (str | AnalyzedDocument) to analyze
+            
+        Returns:
+            list: Complexity metrics per text, in order
+        """
+        docs = [analyze_document(text) for text in texts]
+        results = [self._heuristic_complexity(doc) for doc in docs]
+        
+        # Prefer the fine-tuned model when one is configured
+        scored = [i for i, result in enumerate(results) if 'error' not in result]
+        predictions = self.classify_difficulty_many([docs[i].text for i in scored])
+        for i, (difficulty, confidence) in zip(scored, predictions or []):
+            results[i].update(difficulty_level=difficulty, difficulty_source='model',
+                              difficulty_confidence=confidence)
+        return results
+    
+    def _heuristic_complexity(self, doc):
+        """Sentence length and technical term density metrics with a heuristic difficulty"""
         try:
             # Basic metrics
-            word_count = len(text.split())
-            sentence_count = len([s for s in text.split('.') if s.strip()])
+            word_count = doc.word_count
+            sentence_count = len(doc.sentences)
             avg_words_per_sentence = word_count / max(sentence_count, 1)
             
             # Technical term density
-            technical_terms = self._extract_technical_terms(text)
+            technical_terms = self._extract_technical_terms(doc)
             technical_density = len(technical_terms) / max(word_count, 1)
             
             # Complexity classification
@@ -265,6 +451,8 @@ class DeepLearningService:
                 'avg_words_per_sentence': round(avg_words_per_sentence, 2),
                 'technical_density': round(technical_density, 3),
                 'difficulty_level': difficulty,
+                'difficulty_source': 'heuristic',
+                'difficulty_confidence': None,
                 'technical_terms_found': len(technical_terms)
             }
             
@@ -281,14 +469,13 @@ class DeepLearningService:
         Simple extractive summarization fallback that doesn't require NumPy
         Selects sentences based on keyword frequency and position
         """
-        import re
+        doc = analyze_document(text)
         
-        # Split into sentences
-        sentences = re.split(r'[.!?]+', text)
-        sentences = [s.strip() for s in sentences if len(s.strip()) > 20]
+        # Reuse the document's sentence segmentation (split at '.', '!' and '?')
+        sentences = [s for s in doc.punctuated_sentences if len(s) > 20]
         
         if len(sentences) <= sentence_count:
-            return text
+            return doc.text
         
         # Score sentences based on length and position (early sentences often important)
         scored_sentences = []
@@ -1,37 +1,36 @@
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, TrainingArguments, Trainer
+from transformers import AutoTokenizer, AutoModelForSequenceClassification, TrainingArguments, Trainer, DataCollatorWithPadding
 from datasets import load_dataset
+import argparse
+import numpy as np
 import torch
 from sklearn.metrics import accuracy_score
+from training_data import load_tokenized_dataset
 
-# Load dataset
-dataset = load_dataset("imdb")
-
-# Load model and tokenizer
 model_name = "bert-base-uncased"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForSequenceClassification.from_pretrained(model_name, num_labels=2)
-
-# Tokenize function
-def tokenize_function(examples):
-    return tokenizer(examples["text"], padding="max_length", truncation=True, max_length=256)
-
-# Tokenize dataset
-tokenized_datasets = dataset.map(tokenize_function, batched=True)
-
-# Training arguments
-training_args = TrainingArguments(
-    output_dir="./results",
-    num_train_epochs=3,
-    per_device_train_batch_size=16,
-    per_device_eval_batch_size=16,
-    warmup_steps=500,
-    weight_decay=0.01,
-    logging_dir="./logs",
-    logging_steps=10,
-    evaluation_strategy="epoch",
-    save_strategy="epoch",
-    load_best_model_at_end=True,
-)
+max_length = 256
+
+# Training configurations; the CPU profile trades nothing for accuracy, only
+# removes padding work and tunes the runtime for CPU-only machines
+PROFILES = {
+    "default": {"dynamic_padding": False, "group_by_length": False, "bf16": False, "compile": False},
+    "cpu": {"dynamic_padding": True, "group_by_length": True, "bf16": True, "compile": False},
+    "cpu-compile": {"dynamic_padding": True, "group_by_length": True, "bf16": True, "compile": True},
+}
+
+def cpu_supports_bf16():
+    """Whether bf16 autocast is hardware-accelerated on this CPU (AVX512-BF16 / AMX)"""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+def configure_threads(num_threads=None, interop_threads=None):
+    """Set intra-op and inter-op thread pools; must run before any torch work"""
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    if interop_threads:
+        torch.set_num_interop_threads(interop_threads)
+    return torch.get_num_threads(), torch.get_num_interop_threads()
 
 # Metrics function
 def compute_metrics(eval_pred):
@@ -39,18 +38,86 @@ def compute_metrics(eval_pred):
     predictions = np.argmax(predictions, axis=1)
     return {"accuracy": accuracy_score(labels, predictions)}
 
-# Initialize trainer
-trainer = Trainer(
-    model=model,
-    args=training_args,
-    train_dataset=tokenized_datasets["train"],
-    eval_dataset=tokenized_datasets["test"],
-    compute_metrics=compute_metrics,
-)
-
-# Start training
-trainer.train()
-
-# Save model
-trainer.save_model("./fine-tuned-bert")
-tokenizer.save_pretrained("./fine-tuned-bert")
+def build_trainer(profile="default", output_dir="./results", max_steps=None, train_samples=None):
+    settings = PROFILES[profile]
+    use_cpu = not torch.cuda.is_available()
+    bf16 = settings["bf16"] and (not use_cpu or cpu_supports_bf16())
+
+    # Load model and tokenizer
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name, num_labels=2)
+
+    # Tokenize dataset
+    if settings["dynamic_padding"]:
+        # Truncate only and pad per batch; tokenization is cached on disk
+        tokenized_datasets = load_tokenized_dataset(
+            lambda: load_dataset("imdb"), tokenizer, max_length, dataset_name="imdb"
+        )
+        data_collator = DataCollatorWithPadding(tokenizer, pad_to_multiple_of=8)
+    else:
+        def tokenize_function(examples):
+            return tokenizer(examples["text"], padding="max_length", truncation=True, max_length=max_length)
+
+        tokenized_datasets = load_dataset("imdb").map(tokenize_function, batched=True)
+        data_collator = None
+
+    train_dataset = tokenized_datasets["train"]
+    eval_dataset = tokenized_datasets["test"]
+    if train_samples:
+        train_dataset = train_dataset.shuffle(seed=42).select(range(train_samples))
+
+    # Training arguments
+    training_args = TrainingArguments(
+        output_dir=output_dir,
+        num_train_epochs=3,
+        max_steps=max_steps or -1,
+        per_device_train_batch_size=16,
+        per_device_eval_batch_size=16,
+        warmup_steps=500 if not max_steps else 0,
+        weight_decay=0.01,
+        logging_dir="./logs",
+        logging_steps=10,
+        evaluation_strategy="epoch" if not max_steps else "no",
+        save_strategy="epoch" if not max_steps else "no",
+        load_best_model_at_end=not max_steps,
+        group_by_length=settings["group_by_length"],
+        bf16=bf16,
+        use_cpu=use_cpu,
+        torch_compile=settings["compile"],
+        dataloader_num_workers=2 if settings["dynamic_padding"] else 0,
+        report_to="none",
+    )
+
+    # Initialize trainer
+    trainer = Trainer(
+        model=model,
+        args=training_args,
+        train_dataset=train_dataset,
+        eval_dataset=eval_dataset,
+        data_collator=data_collator,
+        compute_metrics=compute_metrics,
+    )
+    return trainer, tokenizer
+
+def main():
+    parser = argparse.ArgumentParser(description="Fine-tune BERT on IMDB")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="default")
+    parser.add_argument("--threads", type=int, help="torch intra-op threads")
+    parser.add_argument("--interop-threads", type=int, help="torch inter-op threads")
+    args = parser.parse_args()
+
+    threads, interop = configure_threads(args.threads, args.interop_threads)
+    print(f"Profile: {args.profile}, threads: {threads}, interop threads: {interop}, "
+          f"CPU bf16: {cpu_supports_bf16()}")
+
+    trainer, tokenizer = build_trainer(args.profile)
+
+    # Start training
+    trainer.train()
+
+    # Save model
+    trainer.save_model("./fine-tuned-bert")
+    tokenizer.save_pretrained("./fine-tuned-bert")
+
+if __name__ == "__main__":
+    main()
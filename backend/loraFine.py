@@ -1,60 +1,228 @@
-from transformers import AutoModelForCausalLM, AutoTokenizer, TrainingArguments
+from transformers import AutoModelForCausalLM, AutoTokenizer, TrainingArguments, Trainer, TrainerCallback
 from peft import LoraConfig, get_peft_model, TaskType
-from trl import SFTTrainer
 from datasets import load_dataset
+from itertools import chain
+import argparse
+import time
+import torch
 
-# Load model and tokenizer
 model_name = "microsoft/DialoGPT-medium"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForCausalLM.from_pretrained(model_name)
-
-# Add padding token if missing
-if tokenizer.pad_token is None:
-    tokenizer.pad_token = tokenizer.eos_token
-
-# LoRA configuration
-lora_config = LoraConfig(
-    r=16,
-    lora_alpha=32,
-    target_modules=["q_proj", "v_proj"],
-    lora_dropout=0.05,
-    bias="none",
-    task_type=TaskType.CAUSAL_LM
-)
-
-# Apply LoRA
-model = get_peft_model(model, lora_config)
-model.print_trainable_parameters()
-
-# Training arguments
-training_args = TrainingArguments(
-    output_dir="./lora-results",
-    num_train_epochs=3,
-    per_device_train_batch_size=4,
-    gradient_accumulation_steps=4,
-    warmup_steps=100,
-    logging_steps=10,
-    save_steps=500,
-    learning_rate=2e-4,
-    fp16=True,
-    optim="paged_adamw_8bit",
-)
-
-# Load and prepare dataset
-dataset = load_dataset("wikitext", "wikitext-2-raw-v1")
-
-# Trainer
-trainer = SFTTrainer(
-    model=model,
-    args=training_args,
-    train_dataset=dataset["train"],
-    dataset_text_field="text",
-    max_seq_length=512,
-    tokenizer=tokenizer,
-)
-
-# Train
-trainer.train()
-
-# Save
-trainer.save_model("./lora-fine-tuned")
\ No newline at end of file
+
+# Attention projections to adapt, by architecture
+LORA_TARGET_MODULES = {
+    "gpt2": ["c_attn"],  # DialoGPT is a GPT-2 model (fused q/k/v in a Conv1D)
+    "gpt_neox": ["query_key_value"],
+    "bloom": ["query_key_value"],
+    "falcon": ["query_key_value"],
+    "opt": ["q_proj", "v_proj"],
+    "llama": ["q_proj", "v_proj"],
+    "mistral": ["q_proj", "v_proj"],
+}
+
+def detect_target_modules(model):
+    """Pick LoRA target modules that actually exist in the model"""
+    known = LORA_TARGET_MODULES.get(model.config.model_type)
+    module_names = {name.split(".")[-1] for name, _ in model.named_modules()}
+    if known and all(name in module_names for name in known):
+        return known
+    # Unknown architecture: fall back to any common attention projection names present
+    for candidates in (["q_proj", "v_proj"], ["query", "value"], ["c_attn"], ["query_key_value"]):
+        if all(name in module_names for name in candidates):
+            return candidates
+    raise ValueError(f"Could not detect LoRA target modules for model type '{model.config.model_type}'")
+
+def cpu_supports_bf16():
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+def load_text_dataset(streaming=False):
+    # Streaming reads the corpus lazily so memory stays flat regardless of size
+    dataset = load_dataset("wikitext", "wikitext-2-raw-v1", split="train", streaming=streaming)
+    return dataset.filter(lambda example: len(example["text"].strip()) > 0)
+
+def prepare_dataset(dataset, tokenizer, seq_length, packing=True):
+    """
+    Tokenize the corpus into training sequences
+
+    With packing, lines are joined with EOS and cut into full seq_length
+    blocks, so no position is spent on padding. Without packing each line is
+    its own padded sequence (the previous behaviour).
+    """
+    if packing:
+        def tokenize_function(examples):
+            return tokenizer([text + tokenizer.eos_token for text in examples["text"]])
+
+        def group_texts(examples):
+            concatenated = list(chain.from_iterable(examples["input_ids"]))
+            total_length = (len(concatenated) // seq_length) * seq_length
+            blocks = [concatenated[i:i + seq_length] for i in range(0, total_length, seq_length)]
+            return {"input_ids": blocks, "attention_mask": [[1] * seq_length for _ in blocks]}
+
+        tokenized = dataset.map(tokenize_function, batched=True, remove_columns=["text"])
+        # Remainders shorter than seq_length at the end of each map batch are dropped
+        return tokenized.map(group_texts, batched=True, batch_size=1000,
+                             remove_columns=["input_ids", "attention_mask"])
+
+    def tokenize_padded(examples):
+        return tokenizer(examples["text"], truncation=True, max_length=seq_length, padding="max_length")
+
+    return dataset.map(tokenize_padded, batched=True, remove_columns=["text"])
+
+class CausalLMCollator:
+    """
+    Pads a batch and sets labels to the input ids, ignoring padded positions
+
+    Padding is found through attention_mask rather than the token id: the
+    pad token is EOS here, and masking by id (as DataCollatorForLanguageModeling
+    does) would also hide the real EOS between packed sequences, so the model
+    would never learn to stop.
+    """
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+
+    def __call__(self, features):
+        batch = self.tokenizer.pad(features, return_tensors="pt")
+        labels = batch["input_ids"].clone()
+        labels[batch["attention_mask"] == 0] = -100
+        batch["labels"] = labels
+        return batch
+
+class TokenCountingCollator:
+    """Wraps a collator and counts real vs. total tokens per batch"""
+
+    def __init__(self, collator):
+        self.collator = collator
+        self.real_tokens = 0
+        self.total_tokens = 0
+
+    def __call__(self, features):
+        batch = self.collator(features)
+        self.real_tokens += int(batch["attention_mask"].sum())
+        self.total_tokens += batch["attention_mask"].numel()
+        return batch
+
+class ThroughputCallback(TrainerCallback):
+    def __init__(self, counter):
+        self.counter = counter
+        self.started = None
+        self.seconds = 0
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        self.started = time.perf_counter()
+
+    def on_train_end(self, args, state, control, **kwargs):
+        self.seconds = time.perf_counter() - self.started
+
+    def report(self):
+        seconds = max(self.seconds, 1e-9)
+        return {
+            "tokens_per_sec": round(self.counter.real_tokens / seconds, 1),
+            "padded_tokens_per_sec": round(self.counter.total_tokens / seconds, 1),
+            "padding_ratio": round(1 - self.counter.real_tokens / max(self.counter.total_tokens, 1), 4),
+            "seconds": round(seconds, 1),
+        }
+
+def train(packing=True, streaming=False, seq_length=512, max_steps=-1, output_dir="./lora-results", save=True):
+    use_cpu = not torch.cuda.is_available()
+
+    # Load model and tokenizer
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForCausalLM.from_pretrained(model_name)
+
+    # Add padding token if missing
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    # LoRA configuration
+    lora_config = LoraConfig(
+        r=16,
+        lora_alpha=32,
+        target_modules=detect_target_modules(model),
+        lora_dropout=0.05,
+        bias="none",
+        task_type=TaskType.CAUSAL_LM,
+        fan_in_fan_out=model.config.model_type == "gpt2",  # GPT-2 Conv1D stores weights transposed
+    )
+
+    # Apply LoRA
+    model = get_peft_model(model, lora_config)
+    model.print_trainable_parameters()
+
+    # Streaming datasets have no length, so training is bounded by steps
+    if streaming and max_steps <= 0:
+        max_steps = 1000
+
+    # Training arguments: fp16 and paged 8-bit AdamW need a GPU (bitsandbytes)
+    training_args = TrainingArguments(
+        output_dir=output_dir,
+        num_train_epochs=3,
+        max_steps=max_steps,
+        per_device_train_batch_size=4,
+        gradient_accumulation_steps=4,
+        warmup_steps=100 if max_steps <= 0 or max_steps > 200 else 0,
+        logging_steps=10,
+        save_steps=500,
+        learning_rate=2e-4,
+        fp16=not use_cpu,
+        bf16=use_cpu and cpu_supports_bf16(),
+        optim="adamw_torch" if use_cpu else "paged_adamw_8bit",
+        use_cpu=use_cpu,
+        dataloader_num_workers=0,  # Token counting happens in the collator
+        report_to="none",
+    )
+
+    # Load and prepare dataset
+    train_dataset = prepare_dataset(load_text_dataset(streaming), tokenizer, seq_length, packing=packing)
+
+    counter = TokenCountingCollator(CausalLMCollator(tokenizer))
+    throughput = ThroughputCallback(counter)
+
+    # Trainer
+    trainer = Trainer(
+        model=model,
+        args=training_args,
+        train_dataset=train_dataset,
+        data_collator=counter,
+        callbacks=[throughput],
+    )
+
+    # Train
+    trainer.train()
+    stats = throughput.report()
+    print(f"Packing {'on' if packing else 'off'}: {stats['tokens_per_sec']:.0f} tokens/sec, "
+          f"padding ratio {stats['padding_ratio']:.2%}")
+
+    # Save
+    if save:
+        trainer.save_model("./lora-fine-tuned")
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="LoRA fine-tuning of DialoGPT on wikitext")
+    parser.add_argument("--no-packing", action="store_true", help="One padded sequence per line")
+    parser.add_argument("--streaming", action="store_true", help="Stream the dataset instead of loading it")
+    parser.add_argument("--seq-length", type=int, default=512)
+    parser.add_argument("--max-steps", type=int, default=-1)
+    parser.add_argument("--benchmark", type=int, metavar="STEPS",
+                        help="Train STEPS steps with packing on and off and compare tokens/sec")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        results = {}
+        for packing in (False, True):
+            results[packing] = train(packing=packing, streaming=args.streaming, seq_length=args.seq_length,
+                                     max_steps=args.benchmark, output_dir="./lora-benchmark", save=False)
+        print(f"\n{'packing':<10}{'tokens/s':>12}{'padding':>10}{'seconds':>10}")
+        for packing, stats in results.items():
+            print(f"{'on' if packing else 'off':<10}{stats['tokens_per_sec']:>12.0f}"
+                  f"{stats['padding_ratio']:>10.2%}{stats['seconds']:>10}")
+        return
+
+    train(packing=not args.no_packing, streaming=args.streaming,
+          seq_length=args.seq_length, max_steps=args.max_steps)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,508 @@
+"""
+Related Cards Index for UKnow
+Sparse TF-IDF vectors over flashcard term and context text, persisted as
+memory-mapped arrays and kept in step with the flashcard table through a
+trigger-maintained change log, serving top-k cosine neighbours for one card
+or a group of cards (e.g. weaknesses)
+"""
+
+import os
+import re
+import json
+import math
+import time
+import shutil
+import threading
+import logging
+from collections import Counter
+import numpy as np
+from scipy import sparse
+from sqlalchemy import text as sql_text
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9]+")
+STOP_WORDS = frozenset("""
+    a an and are as at be been but by can did do does for from had has have he her his how i if in into is it
+    its may more most not of on or our she so such than that the their them then there these they this those
+    to was we were what when where which while who why will with would you your also other some only each
+""".split())
+
+TERM_WEIGHT = 3  # One occurrence in the term counts as this many in the context
+COMPACT_MIN_ROWS = 1000  # Pending changes before they are written to disk
+SYNC_CHUNK_SIZE = 1000  # Flashcards read per query while syncing
+REQUEST_SYNC_MAX_CHANGES = 200  # Larger backlogs are indexed by a background thread
+CHANGE_LOG_RETENTION = 100000  # Log entries kept behind the last compaction, for processes that lag
+
+ARRAY_NAMES = ('indptr', 'indices', 'data', 'card_ids')
+
+CHANGE_LOG_TABLE = 'flashcard_change'
+
+# Every insert, delete or term/context edit appends the card id; ids only grow (AUTOINCREMENT),
+# so each index just remembers the last entry it applied
+CREATE_CHANGE_LOG = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {CHANGE_LOG_TABLE} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        flashcard_id INTEGER NOT NULL
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {CHANGE_LOG_TABLE}_ai AFTER INSERT ON flashcard BEGIN
+        INSERT INTO {CHANGE_LOG_TABLE} (flashcard_id) VALUES (new.id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {CHANGE_LOG_TABLE}_ad AFTER DELETE ON flashcard BEGIN
+        INSERT INTO {CHANGE_LOG_TABLE} (flashcard_id) VALUES (old.id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {CHANGE_LOG_TABLE}_au AFTER UPDATE OF term, context ON flashcard BEGIN
+        INSERT INTO {CHANGE_LOG_TABLE} (flashcard_id) VALUES (new.id);
+    END
+    """
+]
+
+def create_change_log(conn):
+    """Create the flashcard change log and its triggers if missing"""
+    for statement in CREATE_CHANGE_LOG:
+        conn.execute(sql_text(statement))
+
+def _generation_owner_alive(name):
+    """Whether the process that wrote a gen-<pid>-<ns> directory is still running"""
+    parts = name.split('-')
+    if len(parts) != 3 or not parts[1].isdigit():
+        return False  # gen-<ns>, written before generations carried their pid
+    pid = int(parts[1])
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def tokenize(text):
+    """Lowercase word tokens without stop words"""
+    return [token for token in TOKEN_PATTERN.findall((text or '').lower()) if token not in STOP_WORDS]
+
+class RelatedCardsIndex:
+    """
+    TF-IDF cosine similarity over flashcards
+
+    Rows hold sublinear term frequencies (1 + log tf); IDF weights and row
+    norms are applied at query time, so adding or removing a card only
+    touches that card's row and the document frequencies. Rows written by
+    the last compaction live in memory-mapped .npy files (CSR with int32
+    indices); newer cards are held in memory until the next compaction, and
+    removed cards are masked out. The flashcard table is the source of
+    truth: sync() applies the change log entries after the last one the
+    index has seen (saved with each generation), so anything not yet on
+    disk is simply re-applied after a restart. Requests only apply small
+    backlogs; catch_up() hands larger ones, full reconciles and compaction
+    to a background thread.
+
+    One query costs a single sparse matrix-vector product, linear in the
+    number of stored entries, instead of comparing every pair of cards.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._background = None
+        self._created_generations = set()
+        self._reset()
+        self.load()
+
+    def _reset(self):
+        self._vocabulary = {}
+        self._tokens = []
+        self._document_frequency = []
+        self._base = None  # csr_matrix over memory-mapped arrays
+        self._base_ids = np.zeros(0, dtype=np.int64)
+        self._base_rows = {}
+        self._removed = np.zeros(0, dtype=bool)
+        self._removed_count = 0
+        self._pending = {}  # card_id -> (columns, values)
+        self._change_seq = None  # Last change log entry applied; None until a full reconcile
+        self._invalidate()
+
+    def _invalidate(self):
+        self._idf = None
+        self._base_norms = None
+
+    def __len__(self):
+        return len(self._base_ids) - self._removed_count + len(self._pending)
+
+    # Persistence
+
+    def _current_generation(self):
+        with open(os.path.join(self.directory, 'CURRENT')) as f:
+            return f.read().strip()
+
+    def load(self, generation=None):
+        """Map a compacted generation (default: CURRENT) from disk; returns False when there is none"""
+        try:
+            path = os.path.join(self.directory, generation or self._current_generation())
+            arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in ARRAY_NAMES}
+            with open(os.path.join(path, 'vocabulary.json')) as f:
+                tokens = json.load(f)
+            try:
+                with open(os.path.join(path, 'meta.json')) as f:
+                    change_seq = json.load(f)['change_seq']
+            except FileNotFoundError:
+                change_seq = None  # Written before the change log; reconciled in full once
+        except (OSError, ValueError, KeyError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning(f"Could not load related cards index, it will be rebuilt: {e}")
+            return False
+
+        with self._lock:
+            self._reset()
+            self._tokens = tokens
+            self._vocabulary = {token: column for column, token in enumerate(tokens)}
+            self._base_ids = np.asarray(arrays['card_ids'])
+            self._base = sparse.csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']),
+                                           shape=(len(self._base_ids), len(tokens)), copy=False)
+            self._base_rows = {int(card_id): row for row, card_id in enumerate(self._base_ids)}
+            self._removed = np.zeros(len(self._base_ids), dtype=bool)
+            self._document_frequency = np.bincount(self._base.indices, minlength=len(tokens)).tolist()
+            self._change_seq = change_seq
+        logger.info(f"Loaded related cards index: {len(self._base_ids)} cards, {len(tokens)} terms")
+        return True
+
+    def save(self):
+        """
+        Compact pending additions and removals into a new on-disk generation
+
+        Files are written to a fresh directory and CURRENT is switched with an
+        atomic rename, so readers never see a half-written index. Only
+        generations this process wrote, or whose writer has exited, are
+        removed afterwards; CURRENT may already point at another process's.
+        """
+        with self._lock:
+            matrix, card_ids = self._combined_rows()
+            generation = f"gen-{os.getpid()}-{time.time_ns()}"
+            path = os.path.join(self.directory, generation)
+            os.makedirs(path)
+            arrays = {
+                'indptr': matrix.indptr.astype(np.int32),
+                'indices': matrix.indices.astype(np.int32),
+                'data': matrix.data.astype(np.float32),
+                'card_ids': card_ids
+            }
+            for name, array in arrays.items():
+                np.save(os.path.join(path, f'{name}.npy'), array)
+            with open(os.path.join(path, 'vocabulary.json'), 'w') as f:
+                json.dump(self._tokens, f)
+            with open(os.path.join(path, 'meta.json'), 'w') as f:
+                json.dump({'change_seq': self._change_seq}, f)
+
+            current = os.path.join(self.directory, 'CURRENT')
+            with open(current + '.tmp', 'w') as f:
+                f.write(generation)
+            os.replace(current + '.tmp', current)
+
+            self._created_generations.add(generation)
+
+            # Open memory maps stay valid after their files are unlinked
+            current = self._current_generation()
+            for name in os.listdir(self.directory):
+                if not name.startswith('gen-') or name in (generation, current):
+                    continue
+                if name in self._created_generations or not _generation_owner_alive(name):
+                    shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+                    self._created_generations.discard(name)
+            self.load(generation)
+
+    def _combined_rows(self):
+        """All live rows (on-disk minus removed, plus pending) as one in-memory CSR matrix"""
+        vocabulary_size = len(self._tokens)
+        parts = []
+        ids = []
+        if self._base is not None and len(self._base_ids):
+            keep = ~self._removed
+            base = sparse.csr_matrix((self._base.data, self._base.indices, self._base.indptr),
+                                     shape=(self._base.shape[0], vocabulary_size))
+            parts.append(base[keep])
+            ids.append(self._base_ids[keep])
+        if self._pending:
+            pending_ids = sorted(self._pending)
+            parts.append(self._pending_matrix(pending_ids, vocabulary_size))
+            ids.append(np.array(pending_ids, dtype=np.int64))
+        if not parts:
+            return sparse.csr_matrix((0, vocabulary_size), dtype=np.float32), np.zeros(0, dtype=np.int64)
+        return sparse.vstack(parts, format='csr', dtype=np.float32), np.concatenate(ids)
+
+    def _pending_matrix(self, card_ids, vocabulary_size):
+        rows = [self._pending[card_id] for card_id in card_ids]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(columns) for columns, _ in rows])
+        indices = np.concatenate([columns for columns, _ in rows]) if rows else np.zeros(0, dtype=np.int32)
+        data = np.concatenate([values for _, values in rows]) if rows else np.zeros(0, dtype=np.float32)
+        return sparse.csr_matrix((data, indices, indptr), shape=(len(rows), vocabulary_size))
+
+    # Incremental updates
+
+    def _vectorize(self, term, context):
+        """Sparse sublinear-tf row for a card, growing the vocabulary as needed"""
+        counts = Counter(tokenize(context))
+        for token in tokenize(term):
+            counts[token] += TERM_WEIGHT
+        columns = []
+        values = []
+        for token, count in counts.items():
+            column = self._vocabulary.get(token)
+            if column is None:
+                column = len(self._tokens)
+                self._vocabulary[token] = column
+                self._tokens.append(token)
+                self._document_frequency.append(0)
+            columns.append(column)
+            values.append(1 + math.log(count))
+        order = np.argsort(columns)
+        return np.array(columns, dtype=np.int32)[order], np.array(values, dtype=np.float32)[order]
+
+    def _row(self, card_id):
+        """(columns, values) of a live card, or None"""
+        if card_id in self._pending:
+            return self._pending[card_id]
+        row = self._base_rows.get(card_id)
+        if row is None or self._removed[row]:
+            return None
+        start, end = self._base.indptr[row], self._base.indptr[row + 1]
+        return self._base.indices[start:end], self._base.data[start:end]
+
+    def add(self, cards):
+        """Index (card_id, term, context) tuples, replacing any existing rows"""
+        with self._lock:
+            cards = list(cards)
+            self.remove(card_id for card_id, _, _ in cards)
+            for card_id, term, context in cards:
+                columns, values = self._vectorize(term, context)
+                for column in columns:
+                    self._document_frequency[column] += 1
+                self._pending[int(card_id)] = (columns, values)
+            self._invalidate()
+
+    def remove(self, card_ids):
+        """Drop cards from the index; unknown ids are ignored"""
+        with self._lock:
+            for card_id in card_ids:
+                card_id = int(card_id)
+                row = self._row(card_id)
+                if row is None:
+                    continue
+                for column in row[0]:
+                    self._document_frequency[column] -= 1
+                if self._pending.pop(card_id, None) is None:
+                    self._removed[self._base_rows[card_id]] = True
+                    self._removed_count += 1
+            self._invalidate()
+
+    def sync(self, conn, max_changes=None, blocking=True):
+        """
+        Apply the flashcard changes logged since the last sync
+
+        Reading the newest change log id is the only query when nothing
+        changed. An index that has never synced, or whose position was pruned
+        from the log, is reconciled against the whole flashcard table.
+
+        Args:
+            max_changes: Leave the index untouched if more changes than this are pending
+            blocking: Wait for a sync already running in another thread
+
+        Returns:
+            tuple: (indexed, removed) card counts, or None if nothing was applied
+            because of max_changes or a sync in progress
+        """
+        if not self._sync_lock.acquire(blocking=blocking):
+            return None
+        try:
+            latest = conn.execute(sql_text(f"SELECT MAX(id) FROM {CHANGE_LOG_TABLE}")).scalar() or 0
+            if self._change_seq is not None and latest <= self._change_seq:
+                return 0, 0
+            oldest = conn.execute(sql_text(f"SELECT MIN(id) FROM {CHANGE_LOG_TABLE}")).scalar()
+            if self._change_seq is None or (oldest is not None and oldest > self._change_seq + 1):
+                if max_changes is not None:
+                    return None
+                return self._reconcile(conn, latest)
+            if max_changes is not None and latest - self._change_seq > max_changes:
+                return None
+
+            indexed = removed = 0
+            while self._change_seq < latest:
+                changes = conn.execute(sql_text(
+                    f"SELECT id, flashcard_id FROM {CHANGE_LOG_TABLE} WHERE id > :after AND id <= :latest "
+                    f"ORDER BY id LIMIT {SYNC_CHUNK_SIZE}"), {'after': self._change_seq, 'latest': latest}).all()
+                if not changes:
+                    break
+                card_ids = {row.flashcard_id for row in changes}
+                rows = self._read_cards(conn, sorted(card_ids))
+                with self._lock:
+                    gone = card_ids - {row[0] for row in rows}
+                    self.remove(gone)
+                    self.add(rows)
+                    self._change_seq = changes[-1].id
+                indexed += len(rows)
+                removed += len(gone)
+            with self._lock:
+                self._change_seq = latest
+            if indexed or removed:
+                logger.info(f"Related cards index synced: {indexed} indexed, {removed} removed")
+            return indexed, removed
+        finally:
+            self._sync_lock.release()
+
+    def _read_cards(self, conn, card_ids):
+        params = {f'c{i}': card_id for i, card_id in enumerate(card_ids)}
+        if not params:
+            return []
+        placeholders = ', '.join(f':{name}' for name in params)
+        return conn.execute(sql_text(
+            f"SELECT id, term, context FROM flashcard WHERE id IN ({placeholders})"), params).all()
+
+    def _reconcile(self, conn, latest):
+        """Diff the index against every flashcard id, then continue from change log entry `latest`"""
+        current_ids = set(conn.execute(sql_text("SELECT id FROM flashcard")).scalars())
+        with self._lock:
+            indexed_ids = {card_id for card_id, row in self._base_rows.items() if not self._removed[row]}
+            indexed_ids.update(self._pending)
+            removed = indexed_ids - current_ids
+            self.remove(removed)
+        added = sorted(current_ids - indexed_ids)
+        for start in range(0, len(added), SYNC_CHUNK_SIZE):
+            rows = self._read_cards(conn, added[start:start + SYNC_CHUNK_SIZE])
+            with self._lock:
+                self.add(rows)
+        with self._lock:
+            self._change_seq = latest
+        logger.info(f"Related cards index reconciled: {len(added)} added, {len(removed)} removed")
+        return len(added), len(removed)
+
+    def needs_compaction(self):
+        return len(self._pending) + self._removed_count >= max(COMPACT_MIN_ROWS, len(self._base_ids) // 10)
+
+    def catch_up(self, engine):
+        """
+        Bring the index up to date on a request path
+
+        Small backlogs are applied inline, so a card created a moment ago
+        already has neighbours. Anything larger, and compaction, runs in a
+        background thread while requests keep using the current index.
+        """
+        with engine.connect() as conn:
+            result = self.sync(conn, max_changes=REQUEST_SYNC_MAX_CHANGES, blocking=False)
+        if result is None or self.needs_compaction():
+            self.start_background_sync(engine)
+
+    def start_background_sync(self, engine):
+        with self._lock:
+            if self._background is not None and self._background.is_alive():
+                return
+            self._background = threading.Thread(target=self._background_sync, args=(engine,),
+                                                name='related-index-sync', daemon=True)
+            self._background.start()
+
+    def _background_sync(self, engine):
+        try:
+            with engine.connect() as conn:
+                self.sync(conn)
+            if self.needs_compaction():
+                self.save()
+                # Entries well behind the saved generation are only needed by processes that lag that far
+                with engine.begin() as conn:
+                    conn.execute(sql_text(f"DELETE FROM {CHANGE_LOG_TABLE} WHERE id <= :before"),
+                                 {'before': (self._change_seq or 0) - CHANGE_LOG_RETENTION})
+        except Exception as e:
+            logger.warning(f"Background related cards index sync failed: {e}")
+
+    def rebuild(self, conn):
+        """Re-index every flashcard from scratch and write it to disk"""
+        with self._sync_lock:
+            with self._lock:
+                self._reset()
+            latest = conn.execute(sql_text(f"SELECT MAX(id) FROM {CHANGE_LOG_TABLE}")).scalar() or 0
+            self._reconcile(conn, latest)
+            self.save()
+
+    # Queries
+
+    def _statistics(self):
+        """Smoothed IDF weights and the IDF-weighted norm of every on-disk row"""
+        if self._idf is None:
+            document_frequency = np.array(self._document_frequency, dtype=np.float32)
+            self._idf = (np.log((1 + len(self)) / (1 + document_frequency)) + 1).astype(np.float32)
+            if self._base is not None:
+                squared = sparse.csr_matrix((self._base.data ** 2, self._base.indices, self._base.indptr),
+                                            shape=self._base.shape)
+                self._base_norms = np.sqrt(squared @ (self._idf[:self._base.shape[1]] ** 2))
+        return self._idf, self._base_norms
+
+    def related(self, card_ids, k=10, exclude=()):
+        """
+        Top-k cards most similar to the given card(s)
+
+        Several cards are combined into the centroid of their normalized
+        TF-IDF vectors. The cards themselves and any ids in exclude are
+        left out of the results.
+
+        Returns:
+            list: (card_id, cosine similarity) pairs, best first
+        """
+        with self._lock:
+            idf, base_norms = self._statistics()
+            query = np.zeros(len(self._tokens), dtype=np.float32)
+            seeds = set()
+            for card_id in card_ids:
+                row = self._row(int(card_id))
+                if row is None:
+                    continue
+                columns, values = row
+                weighted = values * idf[columns]
+                norm = np.linalg.norm(weighted)
+                if norm > 0:
+                    query[columns] += weighted / norm
+                    seeds.add(int(card_id))
+            norm = np.linalg.norm(query)
+            if norm == 0:
+                return []
+            # cosine(row, query) = (tf_row * idf) . query / |tf_row * idf|
+            query *= idf / norm
+
+            scores = []
+            ids = []
+            if self._base is not None and len(self._base_ids):
+                base_scores = self._base @ query[:self._base.shape[1]]
+                base_scores = np.divide(base_scores, base_norms, out=np.zeros_like(base_scores),
+                                        where=base_norms > 0)
+                base_scores[self._removed] = 0
+                scores.append(base_scores)
+                ids.append(self._base_ids)
+            if self._pending:
+                pending_ids = list(self._pending)
+                pending = self._pending_matrix(pending_ids, len(self._tokens))
+                pending_norms = np.sqrt(pending.multiply(pending) @ (idf ** 2))
+                pending_scores = np.divide(pending @ query, pending_norms,
+                                           out=np.zeros(len(pending_ids), dtype=np.float32),
+                                           where=pending_norms > 0)
+                scores.append(pending_scores)
+                ids.append(np.array(pending_ids, dtype=np.int64))
+
+            scores = np.concatenate(scores)
+            ids = np.concatenate(ids)
+            excluded = np.isin(ids, list(seeds | {int(card_id) for card_id in exclude}))
+            scores[excluded] = 0
+
+            k = min(k, int(np.count_nonzero(scores > 0)))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(int(ids[i]), float(scores[i])) for i in top]
@@ -0,0 +1,109 @@
+"""
+Response Encoding for UKnow API
+Fast JSON serialization (orjson when installed, stdlib fallback) and
+negotiated gzip/brotli compression for large responses
+"""
+
+import gzip
+import logging
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+# Optional fast JSON encoder
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Optional brotli support
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/plain', 'text/html', 'text/csv'}
+COMPRESSION_MIN_SIZE = 1024  # Bytes; smaller bodies are not worth the CPU
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider backed by orjson, falling back to the stdlib encoder
+
+    Keys are not sorted by default since ordering is not part of the API and
+    sorting large payloads is measurable work.
+    """
+
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._orjson_dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        # Build the body as bytes directly, skipping the str round-trip
+        return self._app.response_class(self._orjson_dumps(obj), mimetype=self.mimetype)
+
+    def _orjson_dumps(self, obj):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self._app.debug:
+            option |= orjson.OPT_INDENT_2
+        # Types orjson does not know (Decimal, sets, ...) go through Flask's default
+        return orjson.dumps(obj, default=self.default, option=option)
+
+def negotiate_encoding():
+    """Pick the best supported Content-Encoding from the request's Accept-Encoding"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted.quality('br') > 0:
+        return 'br'
+    if accepted.quality('gzip') > 0:
+        return 'gzip'
+    return None
+
+def compress_response(response, min_size=COMPRESSION_MIN_SIZE):
+    """after_request hook: compress buffered, compressible responses above min_size"""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+
+    encoding = negotiate_encoding()
+    if encoding == 'br':
+        compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+    elif encoding == 'gzip':
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL)
+    else:
+        return response
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    response.headers['Content-Length'] = str(len(compressed))
+    return response
+
+def init_response_encoding(app, min_size=COMPRESSION_MIN_SIZE):
+    """Install the fast JSON provider and response compression on a Flask app"""
+    app.json = FastJSONProvider(app)
+    app.after_request(lambda response: compress_response(response, min_size))
+    logger.info(f"JSON encoder: {'orjson' if orjson else 'stdlib'}, "
+                f"compression: {'br, gzip' if brotli else 'gzip'} above {min_size} bytes")
@@ -0,0 +1,88 @@
+"""
+Spaced Repetition Scheduler for UKnow
+Implements the SM-2 algorithm used to decide when each flashcard is due
+"""
+
+from datetime import datetime, timedelta
+import logging
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class SpacedRepetitionScheduler:
+    """
+    SM-2 scheduler that updates per-(user, card) review state incrementally
+    """
+
+    DEFAULT_EASE_FACTOR = 2.5
+    MIN_EASE_FACTOR = 1.3
+
+    # Quality (0-5) used when the client only reports correct/incorrect
+    STATUS_QUALITY = {
+        'correct': 4,
+        'incorrect': 1
+    }
+
+    def quality_from_status(self, status, quality=None):
+        """
+        Resolve the SM-2 response quality for an answer
+
+        Args:
+            status (str): 'correct' or 'incorrect'
+            quality (int): Optional explicit quality grade (0-5)
+
+        Returns:
+            int: Quality grade between 0 and 5
+        """
+        if quality is not None:
+            try:
+                return max(0, min(5, int(quality)))
+            except (TypeError, ValueError):
+                logger.warning(f"Ignoring invalid quality value: {quality}")
+        return self.STATUS_QUALITY.get(status, 0)
+
+    def review(self, repetitions, interval_days, ease_factor, quality, reviewed_at=None):
+        """
+        Apply a single review to the current schedule state
+
+        Args:
+            repetitions (int): Consecutive successful reviews so far
+            interval_days (float): Current inter-review interval in days
+            ease_factor (float): Current ease factor
+            quality (int): Response quality (0-5)
+            reviewed_at (datetime): Time of the review (defaults to now)
+
+        Returns:
+            dict: New repetitions, interval_days, ease_factor and due_at
+        """
+        reviewed_at = reviewed_at or datetime.utcnow()
+        repetitions = repetitions or 0
+        interval_days = interval_days or 0
+        ease_factor = ease_factor or self.DEFAULT_EASE_FACTOR
+
+        if quality >= 3:
+            if repetitions == 0:
+                interval_days = 1
+            elif repetitions == 1:
+                interval_days = 6
+            else:
+                interval_days = round(interval_days * ease_factor, 2)
+            repetitions += 1
+        else:
+            # Failed recall restarts the repetition sequence
+            repetitions = 0
+            interval_days = 1
+
+        ease_factor += 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+        ease_factor = max(self.MIN_EASE_FACTOR, round(ease_factor, 4))
+
+        return {
+            'repetitions': repetitions,
+            'interval_days': interval_days,
+            'ease_factor': ease_factor,
+            'due_at': reviewed_at + timedelta(days=interval_days)
+        }
+
+# Global instance
+sr_scheduler = SpacedRepetitionScheduler()
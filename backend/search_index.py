@@ -0,0 +1,158 @@
+"""
+Full-Text Search Index for UKnow
+Keeps an SQLite FTS5 index over flashcard text in sync via triggers
+and serves bm25-ranked, highlighted, paginated search results
+"""
+
+import re
+import logging
+from sqlalchemy import text as sql_text
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'flashcard_fts'
+
+# Column weights for bm25(): term, question, answer, context
+BM25_WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+
+HIGHLIGHT_OPEN = '<mark>'
+HIGHLIGHT_CLOSE = '</mark>'
+SNIPPET_TOKENS = 16
+
+# External-content table: the text lives in `flashcard`, FTS5 stores only the index
+CREATE_FTS_TABLE = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    term, question, answer, context,
+    content='flashcard', content_rowid='id',
+    tokenize='porter unicode61'
+)
+"""
+
+CREATE_FTS_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON flashcard BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, term, question, answer, context)
+        VALUES (new.id, new.term, new.question, new.answer, new.context);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON flashcard BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, term, question, answer, context)
+        VALUES ('delete', old.id, old.term, old.question, old.answer, old.context);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON flashcard BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, term, question, answer, context)
+        VALUES ('delete', old.id, old.term, old.question, old.answer, old.context);
+        INSERT INTO {FTS_TABLE}(rowid, term, question, answer, context)
+        VALUES (new.id, new.term, new.question, new.answer, new.context);
+    END
+    """,
+]
+
+def search_index_exists(conn):
+    """Check whether the FTS5 table has been created"""
+    row = conn.execute(
+        sql_text("SELECT name FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS_TABLE}
+    ).first()
+    return row is not None
+
+def create_search_index(conn):
+    """
+    Create the FTS5 table and sync triggers if missing
+
+    Returns:
+        bool: True if the index was newly created (and needs a rebuild)
+    """
+    created = not search_index_exists(conn)
+    conn.execute(sql_text(CREATE_FTS_TABLE))
+    for trigger in CREATE_FTS_TRIGGERS:
+        conn.execute(sql_text(trigger))
+    return created
+
+def rebuild_search_index(conn):
+    """Re-index every existing flashcard from the content table"""
+    conn.execute(sql_text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    conn.execute(sql_text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+
+def build_fts_query(query):
+    """
+    Turn free-form user input into a safe FTS5 MATCH expression
+
+    Every word is quoted so FTS5 operators in user input are treated as text;
+    the last word is prefix-matched to support search-as-you-type.
+    """
+    tokens = re.findall(r'\w+', query or '')
+    if not tokens:
+        return None
+    quoted = [f'"{token}"' for token in tokens]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+def search_flashcards(conn, query, set_id=None, page=1, per_page=20):
+    """
+    Search flashcards with bm25 ranking and highlighted snippets
+
+    Args:
+        conn: SQLAlchemy connection
+        query (str): User search text
+        set_id (int): Optional flashcard set filter
+        page (int): 1-based page number
+        per_page (int): Results per page
+
+    Returns:
+        dict: Ranked results and pagination info
+    """
+    match = build_fts_query(query)
+    if not match:
+        return {'results': [], 'page': page, 'per_page': per_page, 'has_more': False}
+
+    weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+    set_filter = 'AND f.set_id = :set_id' if set_id else ''
+
+    # Fetch one extra row to detect another page without a full COUNT(*)
+    rows = conn.execute(sql_text(f"""
+        SELECT f.id, f.set_id, s.title, f.term, f.question, f.answer, f.difficulty_level,
+               bm25({FTS_TABLE}, {weights}) AS score,
+               highlight({FTS_TABLE}, 0, :open, :close) AS term_highlight,
+               snippet({FTS_TABLE}, -1, :open, :close, '...', {SNIPPET_TOKENS}) AS snippet
+        FROM {FTS_TABLE}
+        JOIN flashcard f ON f.id = {FTS_TABLE}.rowid
+        JOIN flashcard_set s ON s.id = f.set_id
+        WHERE {FTS_TABLE} MATCH :match {set_filter}
+        ORDER BY score
+        LIMIT :limit OFFSET :offset
+    """), {
+        'match': match,
+        'set_id': set_id,
+        'open': HIGHLIGHT_OPEN,
+        'close': HIGHLIGHT_CLOSE,
+        'limit': per_page + 1,
+        'offset': (page - 1) * per_page
+    }).mappings().all()
+
+    results = []
+    for row in rows[:per_page]:
+        results.append({
+            'id': row['id'],
+            'set_id': row['set_id'],
+            'set_title': row['title'],
+            'term': row['term'],
+            'question': row['question'],
+            'answer': row['answer'],
+            'difficulty_level': row['difficulty_level'],
+            'score': round(-row['score'], 4),  # bm25() is lower-is-better
+            'term_highlight': row['term_highlight'],
+            'snippet': row['snippet']
+        })
+
+    return {
+        'results': results,
+        'page': page,
+        'per_page': per_page,
+        'has_more': len(rows) > per_page
+    }
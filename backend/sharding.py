@@ -0,0 +1,158 @@
+"""
+Performance Storage Sharding for UKnow
+Routes per-user study data (performance records, daily rollups and review
+schedules) to one of N SQLite files by a consistent hash of the user id,
+while sets, flashcards and users stay in the primary database
+
+SQLite allows one writer per database file, so spreading answers over
+several files lets that many writers commit at once. Each shard connection
+ATTACHes the primary database (read-only in practice), so queries that join
+shard tables with flashcards or users keep working unchanged: unqualified
+names resolve to the shard first and to the primary otherwise.
+"""
+
+import os
+import glob
+import hashlib
+import logging
+from flask import g
+from sqlalchemy import create_engine, event, MetaData, Table, Column, UniqueConstraint, Index
+from sqlalchemy.orm import Session
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PRIMARY_SCHEMA = 'meta'  # Name the primary database is attached under on shard connections
+
+def jump_consistent_hash(key, buckets):
+    """
+    Lamping & Veach jump consistent hash: maps a 64-bit key to [0, buckets)
+
+    Growing from N to N+1 buckets moves only ~1/(N+1) of the keys.
+    """
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return b
+
+def shard_for_user(external_user_id, shard_count):
+    """Shard index for an external user id (stable across processes and restarts)"""
+    digest = hashlib.blake2b(str(external_user_id).encode('utf-8'), digest_size=8).digest()
+    return jump_consistent_hash(int.from_bytes(digest, 'big'), shard_count)
+
+def shard_metadata(tables):
+    """
+    Copies of the given tables for shard files: same columns, unique
+    constraints and indexes, but no foreign keys (SQLite cannot enforce a
+    foreign key into an attached database)
+    """
+    metadata = MetaData()
+    for table in tables:
+        copy = Table(table.name, metadata, *[
+            Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+            for column in table.columns
+        ])
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint):
+                copy.append_constraint(UniqueConstraint(*[copy.c[c.name] for c in constraint.columns],
+                                                        name=constraint.name))
+        for index in table.indexes:
+            Index(index.name, *[copy.c[c.name] for c in index.columns], unique=index.unique)
+    return metadata
+
+class ShardRouter:
+    """
+    Picks the database that holds a user's study data
+
+    With PERFORMANCE_SHARDS = 1 (the default) everything stays in the primary
+    database and sessions are the app's own db.session, so behaviour is
+    unchanged. With N > 1, shard i lives next to the primary database as
+    <name>-shard-<i>.db and each app context gets one session per shard.
+    """
+
+    def __init__(self, db, models):
+        self.db = db
+        self.models = models
+        self.metadata = shard_metadata([model.__table__ for model in models])
+        self.shard_count = 1
+        self._engines = {}
+
+    def init_app(self, app):
+        self.shard_count = max(1, int(app.config.get('PERFORMANCE_SHARDS', 1)))
+        app.teardown_appcontext(self._close_sessions)
+        if self.sharded:
+            logger.info(f"Performance data sharded across {self.shard_count} SQLite files")
+
+    @property
+    def sharded(self):
+        return self.shard_count > 1
+
+    # Engines
+
+    def primary_path(self):
+        return self.db.engine.url.database
+
+    def shard_path(self, index):
+        stem, extension = os.path.splitext(self.primary_path())
+        return f"{stem}-shard-{index}{extension}"
+
+    def existing_shard_paths(self):
+        """Shard files on disk, including ones beyond the configured count"""
+        stem, extension = os.path.splitext(self.primary_path())
+        return sorted(glob.glob(f"{glob.escape(stem)}-shard-*{extension}"))
+
+    def engine_for_path(self, path):
+        """Engine for a shard file, with the primary database attached"""
+        engine = self._engines.get(path)
+        if engine is None:
+            engine = create_engine(f"sqlite:///{path}", connect_args={'timeout': 30})
+            primary = self.primary_path()
+
+            @event.listens_for(engine, 'connect')
+            def attach_primary(dbapi_connection, connection_record):
+                cursor = dbapi_connection.cursor()
+                cursor.execute(f"ATTACH DATABASE ? AS {PRIMARY_SCHEMA}", (primary,))
+                cursor.close()
+
+            self._engines[path] = engine
+        return engine
+
+    def engine(self, index):
+        return self.engine_for_path(self.shard_path(index)) if self.sharded else self.db.engine
+
+    def engines(self):
+        return [self.engine(index) for index in range(self.shard_count)]
+
+    def create_all(self):
+        """Create the shard tables in every configured shard file"""
+        if self.sharded:
+            for engine in self.engines():
+                self.metadata.create_all(engine)
+
+    # Sessions
+
+    def shard_index(self, external_user_id):
+        return shard_for_user(external_user_id, self.shard_count)
+
+    def session(self, index):
+        """This app context's session for a shard"""
+        if not self.sharded:
+            return self.db.session
+        sessions = g.setdefault('_performance_shard_sessions', {})
+        if index not in sessions:
+            sessions[index] = Session(bind=self.engine(index))
+        return sessions[index]
+
+    def session_for(self, external_user_id):
+        """Session for the shard holding a user's records, rollups and schedules"""
+        return self.session(self.shard_index(external_user_id))
+
+    def sessions(self):
+        return [self.session(index) for index in range(self.shard_count)]
+
+    def _close_sessions(self, exception=None):
+        for session in g.pop('_performance_shard_sessions', {}).values():
+            session.close()
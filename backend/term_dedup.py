@@ -0,0 +1,162 @@
+"""
+Near-Duplicate Term Collapsing for UKnow
+Normalizes candidate key terms (casefold, leading determiners, plural
+lemmas) and merges near-duplicates with MinHash over character shingles,
+bucketed by LSH bands, so each concept is generated only once
+"""
+
+import re
+import zlib
+import logging
+import numpy as np
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DETERMINERS = frozenset('a an the this that these those its their his her our your my'.split())
+WORD_PATTERN = re.compile(r"[^\W_]+")
+
+SHINGLE_SIZE = 3
+NEAR_DUPLICATE_THRESHOLD = 0.8  # Minimum shingle Jaccard similarity to merge
+MIN_MINHASH_CHARS = 5  # Shorter keys are only merged on exact match
+
+# 12 bands of 4 rows: pairs at Jaccard 0.8 share a bucket ~99.8% of the time
+MINHASH_BANDS = 12
+MINHASH_ROWS = 4
+MINHASH_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(1)
+MINHASH_A = _rng.integers(1, MINHASH_PRIME, MINHASH_BANDS * MINHASH_ROWS, dtype=np.uint64)
+MINHASH_B = _rng.integers(0, MINHASH_PRIME, MINHASH_BANDS * MINHASH_ROWS, dtype=np.uint64)
+
+SINGULAR_S_ENDINGS = ('ss', 'us', 'is', 'ias')  # class, virus, analysis, bias
+ROMAN_NUMERAL_PATTERN = re.compile(r'm{0,4}(cm|cd|d?c{0,3})(xc|xl|l?x{0,3})(ix|iv|v?i{0,3})')
+
+def lemmatize_word(word):
+    """Reduce a casefolded noun to its singular form with suffix rules"""
+    if len(word) <= 3 or word.endswith(SINGULAR_S_ENDINGS):
+        return word
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith(('shes', 'ches', 'xes', 'zes')) or \
+            (word.endswith('es') and word[:-2].endswith(SINGULAR_S_ENDINGS)):
+        return word[:-2]  # biases -> bias, classes -> class (but databases -> database below)
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+def strip_determiners(words):
+    """Drop leading articles and possessives ("the", "its", ...)"""
+    start = 0
+    while start < len(words) - 1 and words[start].casefold() in DETERMINERS:
+        start += 1
+    return words[start:]
+
+def normalize_term(term):
+    """
+    Comparison key for a term: casefolded, punctuation-free, without leading
+    determiners and with every word lemmatized
+
+    "The Neural Networks" and "neural-network" both become "neural network".
+    """
+    words = WORD_PATTERN.findall(term.casefold().replace("'s", ''))
+    return ' '.join(lemmatize_word(word) for word in strip_determiners(words))
+
+def shingles(key):
+    """Character n-grams of a key, padded so word boundaries count"""
+    padded = f" {key} "
+    return {padded[i:i + SHINGLE_SIZE] for i in range(len(padded) - SHINGLE_SIZE + 1)}
+
+def minhash_signature(shingle_set):
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingle_set),
+                         dtype=np.uint64, count=len(shingle_set)) % MINHASH_PRIME
+    return ((MINHASH_A[:, None] * hashes[None, :] + MINHASH_B[:, None]) % MINHASH_PRIME).min(axis=1)
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+def is_distinguishing_token(token):
+    """Numbers, roman numerals and single letters tell concepts apart ("Type I" vs "Type II")"""
+    return len(token) == 1 or any(c.isdigit() for c in token) or ROMAN_NUMERAL_PATTERN.fullmatch(token) is not None
+
+def may_merge(key_a, key_b):
+    """Whether two normalized keys may be fuzzy-merged: they must not differ in a distinguishing token"""
+    return not any(is_distinguishing_token(token) for token in set(key_a.split()) ^ set(key_b.split()))
+
+def collapse_near_duplicates(candidates, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """
+    Merge candidates that name the same concept
+
+    Terms are first grouped by normalized key. Keys then get a MinHash
+    signature; any two keys that share one of its LSH band buckets are
+    compared by exact shingle Jaccard and merged above threshold, unless the
+    words they differ in include a number, roman numeral or single letter
+    ("World War I" and "World War II" stay apart). Each term
+    is hashed a fixed number of times, so the pass is linear in the number
+    of candidates apart from pairs that actually collide.
+
+    Merged entries keep the most frequent surface form (leading determiners
+    dropped from noun chunks), summed counts, the widest offsets and the
+    earliest context.
+
+    Args:
+        candidates: term -> {'context', 'count', 'first_offset', 'last_offset', 'kind'}
+
+    Returns:
+        tuple: (merged candidates in the same shape, dict of original term -> merged term)
+    """
+    groups = {}
+    for term in candidates:
+        groups.setdefault(normalize_term(term) or term.casefold(), []).append(term)
+    keys = list(groups)
+
+    parent = list(range(len(keys)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    shingle_sets = [shingles(key) for key in keys]
+    buckets = {}
+    for i, key in enumerate(keys):
+        if len(key) < MIN_MINHASH_CHARS:
+            continue
+        signature = minhash_signature(shingle_sets[i])
+        for band in range(MINHASH_BANDS):
+            bucket = buckets.setdefault((band, signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS].tobytes()), [])
+            for j in bucket:
+                root_i, root_j = find(i), find(j)
+                if root_i != root_j and jaccard(shingle_sets[i], shingle_sets[j]) >= threshold \
+                        and may_merge(keys[i], keys[j]):
+                    parent[root_i] = root_j
+            bucket.append(i)
+
+    clusters = {}
+    for i, key in enumerate(keys):
+        clusters.setdefault(find(i), []).extend(groups[key])
+
+    merged = {}
+    aliases = {}
+    for terms in clusters.values():
+        members = [candidates[term] for term in terms]
+        representative = max(terms, key=lambda term: (candidates[term]['count'], -candidates[term]['first_offset']))
+        kind = candidates[representative]['kind']
+        display = representative
+        if kind == 'NOUN_CHUNK':
+            display = ' '.join(strip_determiners(representative.split()))
+        earliest = min(members, key=lambda candidate: candidate['first_offset'])
+
+        # Distinct clusters have distinct keys, so display terms never collide
+        merged[display] = {
+            'context': earliest['context'],
+            'count': sum(candidate['count'] for candidate in members),
+            'first_offset': earliest['first_offset'],
+            'last_offset': max(candidate['last_offset'] for candidate in members),
+            'kind': kind
+        }
+        for term in terms:
+            aliases[term] = display
+
+    return merged, aliases
@@ -0,0 +1,56 @@
+"""
+Tests for near-duplicate term collapsing (term_dedup)
+
+Run from backend/: python -m pytest tests
+"""
+
+import pytest
+
+from term_dedup import collapse_near_duplicates, lemmatize_word, normalize_term
+
+def candidates(*terms):
+    return {term: {'context': f"About {term}.", 'count': 1, 'first_offset': i, 'last_offset': i, 'kind': 'NOUN_CHUNK'}
+            for i, term in enumerate(terms)}
+
+@pytest.mark.parametrize('word, lemma', [
+    ('bias', 'bias'),
+    ('biases', 'bias'),
+    ('class', 'class'),
+    ('classes', 'class'),
+    ('analysis', 'analysis'),
+    ('viruses', 'virus'),
+    ('databases', 'database'),
+    ('boxes', 'box'),
+    ('networks', 'network'),
+    ('probabilities', 'probability'),
+])
+def test_lemmatize_word(word, lemma):
+    assert lemmatize_word(word) == lemma
+
+def test_bias_and_biases_collapse():
+    assert normalize_term('Biases') == normalize_term('bias')
+    merged, aliases = collapse_near_duplicates(candidates('bias', 'biases'))
+    assert len(merged) == 1
+    assert aliases['bias'] == aliases['biases']
+
+@pytest.mark.parametrize('first, second', [
+    ('Type I error', 'Type II error'),
+    ('World War I', 'World War II'),
+    ('Henry VII', 'Henry VIII'),
+    ('GPT-3', 'GPT-4'),
+    ('HTML4', 'HTML5'),
+    ('vitamin A', 'vitamin B'),
+])
+def test_terms_differing_by_a_numeral_or_letter_stay_apart(first, second):
+    merged, aliases = collapse_near_duplicates(candidates(first, second))
+    assert set(merged) == {first, second}
+    assert aliases[first] != aliases[second]
+
+@pytest.mark.parametrize('terms', [
+    ('the neural network', 'Neural Networks', 'neural-network'),
+    ('convolutional neural network', 'convolution neural network'),
+    ('recurrent neural network', 'recurrent neural networks'),
+])
+def test_near_duplicates_collapse(terms):
+    merged, _ = collapse_near_duplicates(candidates(*terms))
+    assert len(merged) == 1
@@ -0,0 +1,150 @@
+"""
+Shared Document Analysis for UKnow
+Segments a text once and lazily caches sentences, token spans, technical
+terms and term-to-sentence offsets so every NLP stage reads the same analysis
+"""
+
+import re
+from bisect import bisect_right
+from functools import cached_property
+
+SENTENCE_PATTERN = re.compile(r'[^.]+')  # Sentences end at periods, like the splitters this replaced
+PUNCTUATED_SENTENCE_PATTERN = re.compile(r'[^.!?]+')  # Also ends at ! and ? (extractive summary)
+TOKEN_PATTERN = re.compile(r'\S+')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+TECHNICAL_PATTERNS = [
+    re.compile(r'\b[A-Z]{2,}\b'),  # Acronyms (CNN, API, etc.)
+    re.compile(r'\b\w*[A-Z]\w*[A-Z]\w*\b'),  # CamelCase terms
+    re.compile(r'\b\w+\([^)]*\)\b'),  # Terms with parentheses
+    re.compile(r'\b\d+\.\d+\b'),  # Version numbers
+    re.compile(r'\b[a-zA-Z]+\d+[a-zA-Z]*\b'),  # Mixed alphanumeric (HTML5, etc.)
+]
+
+COMMON_WORDS = {'THE', 'AND', 'OR', 'BUT', 'IN', 'ON', 'AT', 'TO', 'FOR'}
+
+class AnalyzedDocument:
+    """
+    Lazily analyzed view of a single text
+
+    Every property is computed on first access and cached, so passing the
+    same object between stages never re-splits or re-scans the text.
+    """
+
+    def __init__(self, text):
+        self.text = text or ''
+        self._term_sentences = {}
+        self._nlp_doc = None
+
+    @cached_property
+    def normalized_text(self):
+        """Text with all whitespace runs collapsed to single spaces"""
+        return WHITESPACE_PATTERN.sub(' ', self.text).strip()
+
+    def _iter_stripped_spans(self, pattern):
+        for match in pattern.finditer(self.text):
+            start, end = match.span()
+            segment = match.group()
+            stripped = segment.strip()
+            if not stripped:
+                continue
+            start += len(segment) - len(segment.lstrip())
+            yield start, start + len(stripped)
+
+    @cached_property
+    def sentence_spans(self):
+        """(start, end) offsets of each non-empty period-delimited sentence in the original text"""
+        return list(self._iter_stripped_spans(SENTENCE_PATTERN))
+
+    def iter_sentence_spans(self):
+        """sentence_spans, found lazily unless already cached, for callers that stream through the text"""
+        if 'sentence_spans' in self.__dict__:
+            return iter(self.sentence_spans)
+        return self._iter_stripped_spans(SENTENCE_PATTERN)
+
+    @cached_property
+    def sentences(self):
+        """Stripped sentence strings, aligned with sentence_spans"""
+        return [self.text[start:end] for start, end in self.sentence_spans]
+
+    @cached_property
+    def normalized_sentences(self):
+        """Sentences with whitespace runs collapsed to single spaces"""
+        return [WHITESPACE_PATTERN.sub(' ', sentence) for sentence in self.sentences]
+
+    @cached_property
+    def punctuated_sentences(self):
+        """Stripped sentences split at runs of '.', '!' and '?'"""
+        return [self.text[start:end] for start, end in self._iter_stripped_spans(PUNCTUATED_SENTENCE_PATTERN)]
+
+    @cached_property
+    def _sentence_starts(self):
+        return [start for start, _ in self.sentence_spans]
+
+    @cached_property
+    def token_spans(self):
+        """(start, end) offsets of each whitespace-delimited token"""
+        return [match.span() for match in TOKEN_PATTERN.finditer(self.text)]
+
+    @cached_property
+    def tokens(self):
+        return [self.text[start:end] for start, end in self.token_spans]
+
+    @property
+    def word_count(self):
+        return len(self.token_spans)
+
+    @cached_property
+    def technical_term_offsets(self):
+        """Technical term -> start offsets of its matches, in first-occurrence order"""
+        offsets = {}
+        for pattern in TECHNICAL_PATTERNS:
+            for match in pattern.finditer(self.text):
+                term = match.group()
+                if term.upper() in COMMON_WORDS:
+                    continue
+                offsets.setdefault(term, []).append(match.start())
+        return dict(sorted(offsets.items(), key=lambda item: item[1][0]))
+
+    @property
+    def technical_terms(self):
+        return list(self.technical_term_offsets)
+
+    def sentence_index_at(self, offset):
+        """Index of the sentence containing a character offset, or None"""
+        i = bisect_right(self._sentence_starts, offset) - 1
+        if i >= 0 and offset < self.sentence_spans[i][1]:
+            return i
+        return None
+
+    @cached_property
+    def _lowered_sentences(self):
+        return [sentence.lower() for sentence in self.sentences]
+
+    def term_sentence_indices(self, term):
+        """Indices of sentences containing a term (case-insensitive), cached per term"""
+        key = term.lower()
+        if key not in self._term_sentences:
+            self._term_sentences[key] = [i for i, sentence in enumerate(self._lowered_sentences) if key in sentence]
+        return self._term_sentences[key]
+
+    def sentences_containing(self, term):
+        return [self.sentences[i] for i in self.term_sentence_indices(term)]
+
+    def parse(self, nlp):
+        """Run a spaCy pipeline over the text once and cache the result"""
+        if self._nlp_doc is None:
+            self._nlp_doc = nlp(self.text)
+        return self._nlp_doc
+
+def analyze_document(text):
+    """
+    Get the analysis for a text
+
+    Accepts an existing AnalyzedDocument, returned as-is so stages share its
+    cached results, or a string, which gets a fresh analysis. Request
+    handlers build one document per request and pass it down.
+    """
+    if isinstance(text, AnalyzedDocument):
+        return text
+    return AnalyzedDocument(text)
@@ -0,0 +1,213 @@
+"""
+Training Data Pipeline for UKnow fine-tuning scripts
+Persistent tokenization cache, length-bucketed batching with dynamic padding,
+multi-worker prefetching and per-epoch throughput reporting
+"""
+
+import os
+import re
+import time
+import random
+import shutil
+import hashlib
+import logging
+import torch
+from torch.utils.data import DataLoader, Sampler
+from datasets import load_from_disk
+from transformers import DataCollatorWithPadding
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.tokenized_cache')
+
+def tokenizer_cache_key(tokenizer, max_length, dataset_name):
+    """Cache key that changes whenever the tokenizer, max_length or dataset changes"""
+    fingerprint = '|'.join([
+        tokenizer.__class__.__name__,
+        str(tokenizer.name_or_path),
+        str(len(tokenizer)),
+        str(tokenizer.padding_side),
+        str(max_length),
+        dataset_name
+    ])
+    digest = hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()[:12]
+    safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', f"{dataset_name}-{tokenizer.name_or_path}")
+    return f"{safe_name}-len{max_length}-{digest}"
+
+def load_tokenized_dataset(dataset, tokenizer, max_length, dataset_name,
+                           text_column='text', label_column='label',
+                           cache_dir=DEFAULT_CACHE_DIR, num_proc=None):
+    """
+    Tokenize a DatasetDict once and reuse the result on later runs
+
+    Texts are truncated but not padded; padding happens per batch in the
+    collator. A 'length' column is stored for the length-bucketed sampler.
+
+    Args:
+        dataset: DatasetDict (or a callable returning one, only invoked on cache miss)
+        tokenizer: Hugging Face tokenizer
+        max_length (int): Truncation length
+        dataset_name (str): Name used in the cache key (e.g. 'imdb')
+
+    Returns:
+        DatasetDict: Tokenized splits with input_ids, attention_mask, labels and length
+    """
+    cache_path = os.path.join(cache_dir, tokenizer_cache_key(tokenizer, max_length, dataset_name))
+    if os.path.isdir(cache_path):
+        logger.info(f"Loading tokenized dataset from cache: {cache_path}")
+        try:
+            return load_from_disk(cache_path)
+        except (OSError, ValueError) as e:
+            # e.g. a partial directory left by a run from before caches were renamed into place
+            logger.warning(f"Discarding unreadable tokenized cache {cache_path}: {e}")
+            shutil.rmtree(cache_path, ignore_errors=True)
+
+    if callable(dataset):
+        dataset = dataset()
+
+    def tokenize_function(examples):
+        encoded = tokenizer(examples[text_column], truncation=True, max_length=max_length)
+        encoded['length'] = [len(ids) for ids in encoded['input_ids']]
+        return encoded
+
+    start = time.perf_counter()
+    columns = dataset[next(iter(dataset))].column_names
+    tokenized = dataset.map(
+        tokenize_function,
+        batched=True,
+        num_proc=num_proc,
+        remove_columns=[c for c in columns if c != label_column]
+    )
+    if label_column != 'labels':
+        tokenized = tokenized.rename_column(label_column, 'labels')
+
+    # Written beside the cache and renamed into place, so an interrupted run
+    # never leaves a partial directory that later runs would take for a cache
+    os.makedirs(cache_dir, exist_ok=True)
+    staging_path = f"{cache_path}.tmp-{os.getpid()}"
+    shutil.rmtree(staging_path, ignore_errors=True)
+    tokenized.save_to_disk(staging_path)
+    try:
+        os.replace(staging_path, cache_path)
+    except OSError:
+        # Another run finished the same cache first; keep its copy
+        shutil.rmtree(staging_path, ignore_errors=True)
+        if not os.path.isdir(cache_path):
+            raise
+    logger.info(f"Tokenized {dataset_name} in {time.perf_counter() - start:.1f}s, cached at {cache_path}")
+    return tokenized
+
+class LengthBucketBatchSampler(Sampler):
+    """
+    Batch sampler that groups examples of similar length
+
+    Indices are shuffled, cut into buckets of batch_size * bucket_multiplier,
+    sorted by length inside each bucket and split into batches; batch order is
+    shuffled again so training still sees a random mix of lengths.
+    """
+
+    def __init__(self, lengths, batch_size, bucket_multiplier=50, shuffle=True, drop_last=False, seed=42):
+        self.lengths = list(lengths)
+        self.batch_size = batch_size
+        self.bucket_size = batch_size * bucket_multiplier
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __iter__(self):
+        rng = random.Random(self.seed + self.epoch)
+        indices = list(range(len(self.lengths)))
+        if self.shuffle:
+            rng.shuffle(indices)
+
+        batches = []
+        for start in range(0, len(indices), self.bucket_size):
+            bucket = sorted(indices[start:start + self.bucket_size], key=lambda i: self.lengths[i])
+            for b in range(0, len(bucket), self.batch_size):
+                batch = bucket[b:b + self.batch_size]
+                if len(batch) < self.batch_size and self.drop_last:
+                    continue
+                batches.append(batch)
+
+        if self.shuffle:
+            rng.shuffle(batches)
+        return iter(batches)
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.lengths) // self.batch_size
+        return (len(self.lengths) + self.batch_size - 1) // self.batch_size
+
+def build_dataloader(split, tokenizer, batch_size, shuffle=True, num_workers=None,
+                     prefetch_factor=4, bucket_multiplier=50):
+    """
+    DataLoader with length bucketing, dynamic padding and worker prefetching
+
+    Args:
+        split: Tokenized dataset split from load_tokenized_dataset
+        tokenizer: Tokenizer used for padding
+        batch_size (int): Examples per batch
+        shuffle (bool): Shuffle buckets and batches (training)
+        num_workers (int): Loader processes (defaults to half the CPU count)
+    """
+    if num_workers is None:
+        num_workers = max(1, (os.cpu_count() or 2) // 2)
+
+    sampler = LengthBucketBatchSampler(
+        split['length'], batch_size, bucket_multiplier=bucket_multiplier, shuffle=shuffle
+    )
+    collator = DataCollatorWithPadding(tokenizer, pad_to_multiple_of=8)
+    model_split = split.remove_columns(['length'])
+    model_split.set_format('torch', columns=['input_ids', 'attention_mask', 'labels'])
+
+    worker_kwargs = {}
+    if num_workers > 0:
+        worker_kwargs = {'persistent_workers': True, 'prefetch_factor': prefetch_factor}
+
+    return DataLoader(
+        model_split,
+        batch_sampler=sampler,
+        collate_fn=collator,
+        num_workers=num_workers,
+        **worker_kwargs
+    )
+
+class ThroughputMeter:
+    """
+    Accumulates real and padded token counts without per-step host syncs
+
+    Counts are kept as tensors on the training device and only read back
+    once in report().
+    """
+
+    def __init__(self, device):
+        self.device = device
+        self.reset()
+
+    def reset(self):
+        self.real_tokens = torch.zeros((), dtype=torch.long, device=self.device)
+        self.padded_tokens = 0
+        self.steps = 0
+        self.started = time.perf_counter()
+
+    def update(self, attention_mask):
+        self.real_tokens += attention_mask.sum()
+        self.padded_tokens += attention_mask.numel()
+        self.steps += 1
+
+    def report(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        real = int(self.real_tokens.item())
+        return {
+            'steps': self.steps,
+            'seconds': round(elapsed, 2),
+            'tokens_per_sec': round(real / elapsed, 1),
+            'padded_tokens_per_sec': round(self.padded_tokens / elapsed, 1),
+            'padding_ratio': round(1 - real / max(self.padded_tokens, 1), 4)
+        }